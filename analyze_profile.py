@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import io
+import sys
+import json
+import base64
+import pstats
+import argparse
+from collections import defaultdict
+from tempfile import NamedTemporaryFile
+
+from results import open_results
+from sampler import label
+
+
+def decode_profile(blob):
+    "Decode a base64 encoded profile as stored by run_benchmark.py."
+    with NamedTemporaryFile() as statsfile:
+        statsfile.write(base64.b64decode(blob))
+        statsfile.flush()
+        return pstats.Stats(statsfile.name, stream=io.StringIO())
+
+
+def load_profiles(filename, filter=None):
+    "Returns the merged profile of all matching results and the number of merged profiles."
+    stats = None
+    n = 0
+    with open_results(filename) as results:
+        for doc in results.find(filter, profile=True):
+            if not doc.get('profile'):
+                continue
+            if stats is None:
+                stats = decode_profile(doc['profile'])
+            else:
+                stats.add(decode_profile(doc['profile']))
+            n += 1
+    if stats is None:
+        raise LookupError("No profiles found for filter {}.".format(filter))
+    return stats, n
+
+
+def load_samples(filename, filter=None, categories=None):
+    """Returns the merged sampled stacks of all matching results in seconds
+    and the number of merged results."""
+    stacks = defaultdict(float)
+    n = 0
+    filter = dict(filter or {})
+    filter.setdefault('samples', {'$exists': True})
+    with open_results(filename) as results:
+        for doc in results.find(filter):
+            for cat, samples in doc['samples'].items():
+                if categories is None or cat in categories:
+                    for stack, count in samples['stacks']:
+                        stacks[stack] += count * samples['interval']
+            n += 1
+    if not n:
+        raise LookupError("No sampled stacks found for filter {}.".format(filter))
+    return stacks, n
+
+
+def sampled_times(stacks, n=1):
+    "Returns the average self and cumulative time per function label."
+    times = defaultdict(lambda: [0.0, 0.0])
+    for stack, t in stacks.items():
+        funcs = stack.split(';')
+        times[funcs[-1]][0] += t / n
+        for func in set(funcs):
+            times[func][1] += t / n
+    return times
+
+
+def load_times(filename, filter, args):
+    if args.samples:
+        return sampled_times(*load_samples(filename, filter, args.category))
+    else:
+        return function_times(*load_profiles(filename, filter))
+
+
+def function_times(stats, n=1):
+    "Returns the average self and cumulative time per function label."
+    times = defaultdict(lambda: [0.0, 0.0])
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        times[label(func)][0] += tt / n
+        times[label(func)][1] += ct / n
+    return times
+
+
+def collapse(stats, max_depth=64, min_fraction=1e-4):
+    """Returns collapsed stacks with their self time in microseconds.
+
+    The deterministic profile only records caller-callee pairs, hence the
+    self time of each function is distributed over its call paths in
+    proportion to the cumulative time of each caller edge. Paths are not
+    followed further once their time falls below min_fraction of the total
+    time, which bounds the number of stacks to about 1 / min_fraction.
+    """
+    stacks = defaultdict(float)
+    min_weight = min_fraction * sum(tt for cc, nc, tt, ct, callers in stats.stats.values())
+
+    def walk(func, weight, path):
+        callers = stats.stats[func][4]
+        total = sum(edge[3] for caller, edge in callers.items() if caller not in path)
+        if total <= 0 or len(path) >= max_depth or weight < min_weight:
+            stacks[';'.join(label(f) for f in reversed(path))] += weight
+            return
+        for caller, edge in callers.items():
+            if caller not in path and edge[3] > 0:
+                walk(caller, weight * edge[3] / total, path + [caller])
+
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if tt > 0:
+            walk(func, tt, [func])
+    return {stack: int(round(1e6 * t)) for stack, t in stacks.items() if t >= 5e-7}
+
+
+def main_show(args):
+    if args.samples:
+        times = load_times(args.filename, args.filter, args)
+        column = 0 if args.sort == 'tottime' else 1
+        rows = sorted(times.items(), key=lambda item: item[1][column], reverse=True)
+        print("Average sampled time per result in ms.")
+        print("{:>10} {:>10}  {}".format('tottime', 'cumtime', 'function'))
+        for func, (tt, ct) in rows[:args.limit]:
+            print("{:10.3f} {:10.3f}  {}".format(1e3 * tt, 1e3 * ct, func))
+        return
+    stats, n = load_profiles(args.filename, args.filter)
+    print("Merged {} profile(s).".format(n))
+    stats.stream = sys.stdout
+    stats.sort_stats(args.sort).print_stats(args.limit)
+
+
+def main_diff(args):
+    times_a = load_times(args.filename, args.filter, args)
+    times_b = load_times(args.filename_b or args.filename, args.filter_b, args)
+    column = 0 if args.sort == 'tottime' else 1
+    rows = []
+    for func in set(times_a).union(times_b):
+        t_a = times_a[func][column] if func in times_a else 0.0
+        t_b = times_b[func][column] if func in times_b else 0.0
+        rows.append((t_b - t_a, t_a, t_b, func))
+    rows.sort(key=lambda row: abs(row[0]), reverse=True)
+    print("Average {} per result in ms.".format(args.sort))
+    print("{:>10} {:>10} {:>10} {:>8}  {}".format('A', 'B', 'B-A', 'B/A', 'function'))
+    for delta, t_a, t_b, func in rows[:args.limit]:
+        ratio = '{:.2f}'.format(t_b / t_a) if t_a > 0 else 'new'
+        print("{:10.3f} {:10.3f} {:+10.3f} {:>8}  {}".format(
+            1e3 * t_a, 1e3 * t_b, 1e3 * delta, ratio, func))
+
+
+def main_collapse(args):
+    if args.samples:
+        stacks, n = load_samples(args.filename, args.filter, args.category)
+        stacks = {stack: int(round(1e6 * t)) for stack, t in stacks.items()}
+    else:
+        stacks = collapse(load_profiles(args.filename, args.filter)[0],
+                          min_fraction=args.min_fraction)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        for stack, value in sorted(stacks.items()):
+            out.write('{} {}\n'.format(stack, value))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Analyze the profiles stored with benchmark results.")
+    subparsers = parser.add_subparsers()
+
+    def add_common(p):
+        p.add_argument(
+            'filename', default='benchmark.db', nargs='?',
+            help="The result store that contains the profiles.")
+        p.add_argument(
+            '-f', '--filter', type=json.loads,
+            help="Select the profiles to merge.")
+        p.add_argument(
+            '--limit', type=int, default=30,
+            help="The number of functions to show.")
+        p.add_argument(
+            '--sort', default='tottime', choices=['tottime', 'cumtime'],
+            help="The time to sort functions by.")
+        p.add_argument(
+            '--samples', action='store_true',
+            help="Use the sampled stacks instead of the deterministic profiles.")
+        p.add_argument(
+            '--category', nargs='+',
+            help="Limit the sampled stacks to the given categories.")
+
+    parser_show = subparsers.add_parser('show', help="Print the merged profile.")
+    add_common(parser_show)
+    parser_show.set_defaults(func=main_show)
+
+    parser_diff = subparsers.add_parser(
+        'diff', help="Compare the hot functions of two sets of profiles.")
+    add_common(parser_diff)
+    parser_diff.add_argument(
+        '-g', '--filter-b', type=json.loads, required=True,
+        help="Select the profiles to compare against.")
+    parser_diff.add_argument(
+        '--filename-b',
+        help="The result store of the profiles to compare against, "
+             "defaults to the first one.")
+    parser_diff.set_defaults(func=main_diff)
+
+    parser_collapse = subparsers.add_parser(
+        'collapse', help="Export collapsed stacks for flame graph tools.")
+    add_common(parser_collapse)
+    parser_collapse.add_argument(
+        '-o', '--output', default='-',
+        help="The file to write the collapsed stacks to.")
+    parser_collapse.add_argument(
+        '--min-fraction', type=float, default=1e-4,
+        help="Stop following call paths of the deterministic profile once their "
+             "time falls below this fraction of the total time.")
+    parser_collapse.set_defaults(func=main_collapse)
+
+    args = parser.parse_args()
+    if not hasattr(args, 'func'):
+        parser.print_usage()
+        sys.exit(2)
+    args.func(args)
@@ -19,49 +19,177 @@
 # SOFTWARE.
 import os
 import sys
-from time import time
+import gzip
+import json
+import glob
+import dbm
+import pickle
+import shelve
+import random
 import logging
+from collections import OrderedDict
+from collections import namedtuple
+from tempfile import TemporaryDirectory
 
-import signac
-from tqdm import tqdm
-
-from benchmark import generate_random_data, fmt_size
-from project_benchmark import determine_project_size
-
-logging.basicConfig(level=logging.DEBUG)
-
-N = int(sys.argv[1])
-
-name = 'TestCachingProject-{}'.format(N)
-prefix = 'projects/test-caching-{}'.format(N)
-
-try:
-    project = signac.get_project(root=prefix)
-except LookupError:
-    project = signac.init_project(name, root=prefix)
-    generate_random_data(project, N, 10, 10, 100, 25)
-    project.update_cache()
-
-project._read_cache()
-
-print('JSON metadata size', fmt_size(determine_project_size(project)['statepoint_metadata_size']))
-for (label, fn) in [
-    ('JSON state points file', 'signac_statepoints.json'),
-    ('JSON binary file', '.json-cache.dat'),
-    ('JSON compressed file', project.FN_CACHE),
-    ('pickled cache', '.cache.dat'),
-    ('shelve cache', '.cache.db'),
-]:
-    try:
-        print(label, fmt_size(os.path.getsize(project.fn(fn))))
-    except FileNotFoundError:
-        pass
-
-
-# WITH CACHE
-project = signac.get_project(root=prefix)
-start = time()
-for job in tqdm(project, desc='with cache'):
-    pass
-stop = time()
-print("with cache, time / N: {:.3f}\u00B5s".format(1e6 * (stop - start) / len(project)))
+from signac.contrib.hashing import calc_id
+from signac.contrib.job import Job
+
+from util import fmt_size
+from measure import Timer
+from measure import measure_time
+from benchmark_signac import determine_project_size
+
+
+logger = logging.getLogger(__name__)
+
+
+CacheFormat = namedtuple('CacheFormat', ['filename', 'load', 'dump', 'lookup', 'update'])
+
+
+def _load_json(fn):
+    with open(fn) as file:
+        return json.load(file)
+
+
+def _dump_json(fn, cache):
+    with open(fn, 'w') as file:
+        json.dump(cache, file)
+
+
+def _load_json_gz(fn):
+    with gzip.open(fn, 'rb') as file:
+        return json.loads(file.read().decode())
+
+
+def _dump_json_gz(fn, cache):
+    with gzip.open(fn, 'wb') as file:
+        file.write(json.dumps(cache).encode())
+
+
+def _load_pickle(fn):
+    with open(fn, 'rb') as file:
+        return pickle.load(file)
+
+
+def _dump_pickle(fn, cache):
+    with open(fn, 'wb') as file:
+        pickle.dump(cache, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_shelve(fn):
+    with shelve.open(fn, 'r') as db:
+        return dict(db)
+
+
+def _dump_shelve(fn, cache):
+    with shelve.open(fn, 'n', protocol=pickle.HIGHEST_PROTOCOL) as db:
+        db.update(cache)
+
+
+def _lookup_shelve(fn, _id):
+    with shelve.open(fn, 'r') as db:
+        return db[_id]
+
+
+def _update_shelve(fn, items):
+    with shelve.open(fn, 'w', protocol=pickle.HIGHEST_PROTOCOL) as db:
+        db.update(items)
+
+
+def _format(filename, load, dump, lookup=None, update=None):
+    "Returns a cache format, which loads the full cache for lookups and updates by default."
+    def _lookup(fn, _id):
+        return load(fn)[_id]
+
+    def _update(fn, items):
+        cache = load(fn)
+        cache.update(items)
+        dump(fn, cache)
+
+    return CacheFormat(filename, load, dump, lookup or _lookup, update or _update)
+
+
+FORMATS = OrderedDict([
+    ('json', _format('signac_statepoints.json', _load_json, _dump_json)),
+    ('json_gz', _format('.signac_sp_cache.json.gz', _load_json_gz, _dump_json_gz)),
+    ('pickle', _format('.cache.dat', _load_pickle, _dump_pickle)),
+    ('shelve', _format('.cache.db', _load_shelve, _dump_shelve,
+                       _lookup_shelve, _update_shelve)),
+])
+
+
+def read_statepoints(project):
+    "Returns the mapping of job ids to state points read from the workspace."
+    cache = dict()
+    for entry in os.scandir(project.workspace()):
+        fn = os.path.join(entry.path, Job.FN_MANIFEST)
+        if os.path.isfile(fn):
+            cache[entry.name] = _load_json(fn)
+    return cache
+
+
+def cache_size(fn):
+    "Returns the total size of all files that constitute the cache file fn."
+    return sum(os.path.getsize(fn_) for fn_ in glob.glob(fn + '*'))
+
+
+def benchmark_caching(project, M=100, measure=measure_time):
+    """Benchmark the state point cache of project in each format.
+
+    Determines the on-disk size, the time to load the full cache, to look up
+    a single state point and to update the cache with M new state points.
+    """
+    cache = read_statepoints(project)
+    if not cache:
+        raise ValueError("Unable to benchmark the cache of an empty project.")
+    _id = random.choice(sorted(cache))
+    sp = cache[_id]
+    new = {}
+    for i in range(M):
+        sp_ = dict(sp, cache_update=i)
+        new[calc_id(sp_)] = sp_
+
+    result = OrderedDict()
+    result['M'] = M
+    result['baseline'] = determine_project_size(project)
+    result['formats'] = OrderedDict()
+    root = project.root_directory()
+    with TemporaryDirectory(dir=os.path.dirname(root)) as tmp:
+        fn_new = os.path.join(tmp, 'update.json')
+        _dump_json(fn_new, new)
+        for name, fmt in FORMATS.items():
+            logger.info("Benchmark '{}' cache...".format(name))
+            fn = os.path.join(tmp, fmt.filename)
+            fmt.dump(fn, cache)
+            setup = "from benchmark_caching import FORMATS; "
+            setup += "fmt = FORMATS[{!r}]; fn = {!r}; _id = {!r}; ".format(name, fn, _id)
+            setup += "from benchmark_caching import _load_json; "
+            setup += "items = _load_json({!r})".format(fn_new)
+            data = OrderedDict()
+            data['size'] = cache_size(fn)
+            if name == 'shelve':
+                data['dbm'] = dbm.whichdb(fn)
+            data['load'] = measure(name + '_load', Timer('fmt.load(fn)', setup), 3, 1)
+            data['lookup'] = measure(name + '_lookup', Timer('fmt.lookup(fn, _id)', setup), 3, 10)
+            data['update'] = measure(name + '_update', Timer('fmt.update(fn, items)', setup), 3, 1)
+            result['formats'][name] = data
+    return result
+
+
+if __name__ == '__main__':
+    from benchmark_signac import setup_random_project
+
+    logging.basicConfig(level=logging.INFO)
+    N = int(sys.argv[1])
+
+    with setup_random_project(N, num_keys=10, num_doc_keys=10,
+                              data_size=100, data_std=25) as project:
+        result = benchmark_caching(project)
+
+    print('JSON metadata size', fmt_size(result['baseline']['statepoint_metadata_size']))
+    for name, data in result['formats'].items():
+        print("{:>8}: {:>10}, load {:.3f}s, lookup {:.3f}ms, update {:.3f}s".format(
+            name, fmt_size(data['size']),
+            min(dt / n for n, dt in data['load']),
+            1e3 * min(dt / n for n, dt in data['lookup']),
+            min(dt / n for n, dt in data['update'])))
@@ -0,0 +1,236 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import random
+import logging
+import traceback
+from time import time
+from time import perf_counter
+from collections import OrderedDict
+from collections import defaultdict
+from multiprocessing import Event
+from multiprocessing import Process
+from multiprocessing import Queue
+from queue import Empty
+
+import numpy as np
+import signac
+
+from generate import cpu_count
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIX = 'iterate=1,find=4,open=10,write=2'
+
+
+def parse_mix(mix):
+    "Parse an operation mix such as 'iterate=1,find=4' into normalized weights."
+    weights = OrderedDict()
+    for item in mix.split(','):
+        op, weight = item.split('=')
+        if op not in OPERATIONS:
+            raise ValueError("Unknown operation '{}'.".format(op))
+        weights[op] = float(weight)
+    total = sum(weights.values())
+    return OrderedDict((op, w / total) for op, w in weights.items())
+
+
+def _iterate(project, state):
+    list(project)
+
+
+def _find(project, state):
+    len(project.find_jobs(state['rng'].choice(state['filters'])))
+
+
+def _open(project, state):
+    project.open_job(id=state['rng'].choice(state['ids'])).sp()
+
+
+def _write(project, state):
+    job = project.open_job(id=state['rng'].choice(state['hot']))
+    state['count'] += 1
+    job.document[state['key']] = state['count']
+    state['written'][job.id] = state['count']
+
+
+OPERATIONS = OrderedDict([
+    ('iterate', _iterate),
+    ('find', _find),
+    ('open', _open),
+    ('write', _write),
+])
+
+
+def _worker(root, index, weights, hot, duration, start, queue):
+    try:
+        project = signac.get_project(root=root)
+        rng = random.Random(index)
+        ids = [job.id for job in project.find_jobs()]
+        sample = rng.sample(ids, min(10, len(ids)))
+        state = {
+            'rng': rng,
+            'ids': ids,
+            'hot': hot,
+            'filters': [project.open_job(id=_id).sp() for _id in sample],
+            'key': 'w{}'.format(index),
+            'count': 0,
+            'written': dict(),
+        }
+        ops, probabilities = list(weights), list(weights.values())
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        start.wait()
+        stop = time() + duration
+        while time() < stop:
+            op = rng.choices(ops, probabilities)[0]
+            t0 = perf_counter()
+            try:
+                OPERATIONS[op](project, state)
+            except Exception as error:
+                errors['{}: {}'.format(op, type(error).__name__)] += 1
+            else:
+                latencies[op].append(perf_counter() - t0)
+        queue.put((index, dict(latencies), dict(errors), state['written'], None))
+    except Exception:
+        queue.put((index, None, None, None, traceback.format_exc()))
+
+
+def _check_writes(project, key, written):
+    "Returns the number of lost updates and corrupted documents."
+    lost = corrupted = 0
+    for _id, count in written.items():
+        try:
+            if project.open_job(id=_id).document.get(key) != count:
+                lost += 1
+        except ValueError:
+            corrupted += 1
+    return lost, corrupted
+
+
+def _collect(queue, workers, deadline, poll=1.0):
+    "Returns the results of all workers or raises if a worker exits without a result."
+    results = dict()
+    try:
+        while len(results) < len(workers):
+            try:
+                result = queue.get(timeout=poll)
+                results[result[0]] = result
+                continue
+            except Empty:
+                pass
+            for index, worker in enumerate(workers):
+                if index not in results and not worker.is_alive():
+                    try:
+                        result = queue.get(timeout=poll)
+                        results[result[0]] = result
+                        break
+                    except Empty:
+                        raise RuntimeError("Worker {} exited with code {} without a result.".format(
+                            index, worker.exitcode))
+            if time() > deadline:
+                raise RuntimeError("Workers {} did not finish in time.".format(
+                    sorted(set(range(len(workers))).difference(results))))
+    except BaseException:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        raise
+    return [results[index] for index in range(len(workers))]
+
+
+def run_contention(project, K, weights, duration=5, num_hot=10, timeout=60):
+    """Run K concurrent workers on the project for duration seconds.
+
+    Workers that do not finish within timeout seconds after the duration
+    are terminated.
+    """
+    root = project.root_directory()
+    hot = sorted(job.id for job in project.find_jobs())[:num_hot]
+    start = Event()
+    queue = Queue()
+    workers = [Process(target=_worker, args=(root, i, weights, hot, duration, start, queue))
+               for i in range(K)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    try:
+        results = _collect(queue, workers, time() + duration + timeout)
+    finally:
+        for worker in workers:
+            worker.join()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lost = corrupted = 0
+    for index, lat, err, written, tb in results:
+        if tb is not None:
+            raise RuntimeError("Worker {} failed:\n{}".format(index, tb))
+        for op, x in lat.items():
+            latencies[op].extend(x)
+        for e, n in err.items():
+            errors[e] += n
+        l_, c_ = _check_writes(project, 'w{}'.format(index), written)
+        lost += l_
+        corrupted += c_
+
+    result = {
+        'K': K,
+        'duration': duration,
+        'throughput': sum(len(x) for x in latencies.values()) / duration,
+        'ops': OrderedDict(),
+        'errors': dict(errors),
+        'lost_updates': lost,
+        'corrupted': corrupted,
+    }
+    for op in weights:
+        x = np.array(latencies.get(op, []))
+        result['ops'][op] = {
+            'count': len(x),
+            'throughput': len(x) / duration,
+            'p50': float(np.percentile(x, 50)) if len(x) else None,
+            'p95': float(np.percentile(x, 95)) if len(x) else None,
+            'p99': float(np.percentile(x, 99)) if len(x) else None,
+            'max': float(x.max()) if len(x) else None,
+        }
+    return result
+
+
+def benchmark_contention(project, mix=DEFAULT_MIX, duration=5, workers=None):
+    """Scale the number of concurrent worker processes from 1 to the number
+    of available CPUs and return the results for each number of workers.
+
+    Every worker writes its own document key of a small set of shared jobs,
+    such that lost updates can be detected afterwards.
+    """
+    weights = parse_mix(mix)
+    if workers is None:
+        n = cpu_count()
+        workers = sorted(set([2 ** i for i in range(n.bit_length()) if 2 ** i <= n] + [n]))
+    results = []
+    for K in workers:
+        logger.info("Run contention benchmark with {} worker(s)...".format(K))
+        results.append(run_contention(project, K, weights, duration))
+        if results[-1]['errors'] or results[-1]['lost_updates'] or results[-1]['corrupted']:
+            logger.warning("Detected errors with {} workers: {} errors, {} lost updates, "
+                           "{} corrupted documents.".format(
+                               K, sum(results[-1]['errors'].values()),
+                               results[-1]['lost_updates'], results[-1]['corrupted']))
+    return {'mix': weights, 'results': results}
@@ -18,13 +18,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import os
-import six
-import random
-import string
-import timeit
+import re
+import json
 import logging
-import warnings
-from multiprocessing import Pool
+from functools import partial
 from collections import OrderedDict
 from contextlib import contextmanager
 
@@ -32,24 +29,19 @@ from tqdm import tqdm
 from signac.contrib.hashing import calc_id
 import datreant.core as dtr
 
-if six.PY2:
-    from tempdir import TemporaryDirectory
-else:
-    from tempfile import TemporaryDirectory
+from generate import generate
+from teardown import temporary_directory
+from util import scan_workspace
+from util import size_histogram
+from queries import QueryGenerator
+from queries import flatten
+from measure import Timer
+from measure import measure_time
 
 
 logger = logging.getLogger(__name__)
 
 
-class Timer(timeit.Timer):
-
-    def timeit(self, number=10):
-        return number, super().timeit(number=number)
-
-    def repeat(self, repeat=3, number=10):
-        return super().repeat(repeat=repeat, number=number)
-
-
 def setup(N, root=None):
     if root is None:
         root = '.'
@@ -61,69 +53,67 @@ def setup(N, root=None):
 
 
 def determine_bundle_size(root):
-    bundle = dtr.Bundle(os.path.join(root, 'workspace', '*'))
-    size = 0
-    for t in bundle:
-        for c in t.children:
-            size += os.path.getsize(str(c))
+    "All files within the treant directories are accounted as state point metadata."
+    sizes = [s.get('statepoint', 0) for s in scan_workspace(
+        os.path.join(root, 'workspace'), {}, default='statepoint')]
     return {
-        'N': len(bundle),
-        'total': size,
+        'N': len(sizes),
+        'statepoint_metadata_size': sum(sizes),
+        'document_metadata_size': 0,
+        'total': sum(sizes),
+        'histogram': size_histogram(sizes),
     }
 
 
-def _random_str(size):
-    return ''.join(random.choice(string.ascii_lowercase) for _ in range(size))
+def _categories(sp):
+    "Returns the state point flattened to the scalar values supported as categories."
+    return {key: json.dumps(value) if isinstance(value, list) else value
+            for key, value in flatten(sp)}
 
 
-def _make_doc(i, num_keys=1, data_size=0):
-    assert num_keys >= 1
-    assert data_size >= 0
+def _write_treants(root, jobs):
+    for i, sp, doc in jobs:
+        t = dtr.Treant(os.path.join(root, 'workspace', calc_id(sp)))
+        categories = _categories(sp)
+        t.categories = categories
+        assert t.categories == categories
 
-    doc = {'b_{}'.format(j): _random_str(data_size) for j in range(num_keys - 1)}
-    doc['a'] = '{}{}'.format(i, _random_str(max(0, data_size - len(str(i)))))
-    return doc
 
+def generate_random_data(root, N_sp, num_keys=1, num_doc_keys=0,
+                         data_size=0, data_std=0, seed=0, parallel=True, schema=None):
+    generate(partial(_write_treants, root), N_sp, num_keys, num_doc_keys,
+             data_size, data_std, seed=seed, parallel=parallel, schema=schema)
 
-def _make_treant(root, num_keys, num_doc_keys, data_size, data_std, i):
-    size = max(0, int(random.gauss(data_size, data_std)))
-    sp = _make_doc(i, num_keys, size)
-    _id = calc_id(sp)
-    t = dtr.Treant(os.path.join(root, 'workspace', _id))
-    t.categories = sp
-    assert t.categories == sp
 
-
-def generate_random_data(root, N_sp, num_keys=1, num_doc_keys=0,
-                         data_size=0, data_std=0, parallel=True):
-    if six.PY2:
-        if parallel:
-            warnings.warn("Function 'generate_random_data()' not parallelized for Python 2.")
-            parallel = False
-
-    if parallel:
-        with Pool() as pool:
-            p = [(root, num_keys, num_doc_keys, data_size, data_std, i) for i in range(N_sp)]
-            list(pool.starmap(_make_treant, tqdm(p, desc='init random project data')))
-    else:
-        from functools import partial
-        make = partial(_make_treant, root, num_keys, num_doc_keys, data_size, data_std)
-        list(map(make, tqdm(range(N_sp), desc='init random project data')))
+def _init_random_bundle(root, N, num_keys, num_doc_keys, data_size, data_std, seed,
+                        schema=None):
+    generate_random_data(root, N, num_keys, num_doc_keys, data_size, data_std, seed,
+                         schema=schema)
 
 
 @contextmanager
 def setup_random_bundle(N, num_keys=1, num_doc_keys=0,
-                        data_size=0, data_std=0, seed=0, root=None):
-    random.seed(seed)
+                        data_size=0, data_std=0, seed=0, root=None, cache=None,
+                        schema=None, reaper=None):
     if not isinstance(N, int):
         raise TypeError("N must be an integer!")
 
-    with TemporaryDirectory(dir=root) as tmp:
-        generate_random_data(tmp, N, num_keys, num_doc_keys, data_size, data_std)
-        yield tmp
+    params = dict(N=N, num_keys=num_keys, num_doc_keys=num_doc_keys,
+                  data_size=data_size, data_std=data_std, seed=seed)
+    if schema is not None:
+        params['schema'] = schema
+    init = partial(_init_random_bundle, **params)
+    if cache is None:
+        with temporary_directory(root, reaper) as tmp:
+            init(tmp)
+            yield tmp
+    else:
+        params.update(tool='datreant', version=dtr.__version__)
+        with cache.fixture(params, init, dir=root, reaper=reaper) as tmp:
+            yield tmp
 
 
-def benchmark_bundle(root, keys=None, skip_rich_filter=False):
+def benchmark_bundle(root, keys=None, skip_rich_filter=False, measure=measure_time):
     setup = "import datreant.core as dtr; bundle = dtr.Bundle('{}/workspace/*');".format(root)
     setup += "import random;"
 
@@ -132,7 +122,9 @@ def benchmark_bundle(root, keys=None, skip_rich_filter=False):
     def run(key, timer, repeat=3, number=10):
         if keys is None or key in keys:
             logger.info("Run '{}'...".format(key))
-            data[key] = timer.repeat(repeat=repeat, number=number)
+            result = measure(key, timer, repeat, number)
+            if result is not None:
+                data[key] = result
 
     run('determine_len', Timer('len(bundle)', setup=setup))
 
@@ -160,3 +152,72 @@ def benchmark_bundle(root, keys=None, skip_rich_filter=False):
                           "keys = list(sp); values = [sp[k] for k in keys];"))
 
     return data
+
+
+def _match(value, expr):
+    if not isinstance(expr, dict):
+        return value == expr
+    for op, arg in expr.items():
+        if op == '$exists':
+            ok = arg
+        elif op == '$in':
+            ok = value in arg
+        elif op == '$regex':
+            ok = isinstance(value, str) and re.search(arg, value) is not None
+        else:
+            try:
+                ok = {'$gt': value > arg, '$gte': value >= arg,
+                      '$lt': value < arg, '$lte': value <= arg}[op]
+            except TypeError:
+                ok = False
+        if not ok:
+            return False
+    return True
+
+
+def find_treants(bundle, filter):
+    "Returns the paths of all treants that match the filter, evaluated via categories.groupby()."
+    result = None
+    for key, expr in filter.items():
+        if key == '$and':
+            matches = set.intersection(*[find_treants(bundle, f) for f in expr])
+        elif key == '$or':
+            matches = set.union(*[find_treants(bundle, f) for f in expr])
+        elif isinstance(expr, dict) and expr.get('$exists') is False:
+            # groupby() only yields the treants that have the key.
+            present = {t.abspath for b in bundle.categories.groupby(key).values() for t in b}
+            matches = {t.abspath for t in bundle}.difference(present)
+        else:
+            matches = {t.abspath for value, b in bundle.categories.groupby(key).items()
+                       if _match(value, expr) for t in b}
+        result = matches if result is None else result & matches
+    return result
+
+
+def benchmark_queries(root, selectivities=None, seed=0, measure=measure_time):
+    """Time the groupby equivalent of find_jobs() for filters of each operator
+    class with controlled selectivity.
+
+    Nested state point keys are queried as the flattened categories they are
+    stored as, document keys are not supported by datreant.
+    """
+    bundle = dtr.Bundle(os.path.join(root, 'workspace', '*'))
+    records = [{'sp': dict(t.categories)} for t in bundle]
+    generator = QueryGenerator(records, seed=seed)
+    setup = "import json; import datreant.core as dtr; "
+    setup += "bundle = dtr.Bundle('{}/workspace/*'); ".format(root)
+    setup += "from benchmark_datreant import find_treants; "
+
+    results = []
+    for query in generator(selectivities=selectivities):
+        logger.info("Run '{}' query with selectivity {}...".format(
+            query['operator'], query['target']))
+        matches = len(find_treants(bundle, json.loads(query['filter'])))
+        query['matches'] = matches
+        query['selectivity'] = matches / generator.N
+        query['data'] = measure(
+            'query_{}:{:.0e}'.format(query['operator'], query['target']), Timer(
+                stmt="len(find_treants(bundle, f))",
+                setup=setup + "f = json.loads({!r})".format(query['filter'])))
+        results.append(query)
+    return results
@@ -0,0 +1,132 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import json
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from measure import Timer
+from measure import measure_time
+
+
+logger = logging.getLogger(__name__)
+
+FN_MANIFEST = 'signac_statepoint.json'
+
+
+def job_dirs(workspace):
+    return [entry.path for entry in os.scandir(workspace) if entry.is_dir()]
+
+
+def load(path):
+    with open(os.path.join(path, FN_MANIFEST)) as file:
+        return json.load(file)
+
+
+def statepoints(workspace, executor=None):
+    "Returns the state points of all jobs, loaded in the executor if provided."
+    if executor is None:
+        return [load(path) for path in job_dirs(workspace)]
+    else:
+        return list(executor.map(load, job_dirs(workspace)))
+
+
+def match(sp, filter):
+    for key, value in filter.items():
+        if sp.get(key) != value:
+            return False
+    return True
+
+
+def find(workspace, filter, executor=None):
+    "Returns the state points of all jobs that match the filter."
+    return [sp for sp in statepoints(workspace, executor) if match(sp, filter)]
+
+
+_executor = None
+
+
+def shared_executor():
+    "Returns the thread pool shared by all repeats of a category."
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor()
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def benchmark_workspace(root, keys=None, measure=measure_time):
+    """Benchmark the speed-of-light baseline of each read category, performed
+    with plain filesystem operations and JSON parsing of the state points.
+
+    The categories with a '_threaded' suffix load the state points in a thread
+    pool, which is shared by all repeats of a category.
+    """
+    workspace = os.path.join(root, 'workspace')
+    setup = "import os; import random; "
+    setup += "from benchmark_raw import job_dirs, load, statepoints, find; "
+    setup += "workspace = '{}'; ".format(workspace)
+    setup_threaded = setup + "from benchmark_raw import shared_executor; "
+    setup_threaded += "executor = shared_executor(); "
+
+    data = OrderedDict()
+
+    def run(key, timer, repeat=3, number=10):
+        if keys is None or key in keys:
+            logger.info("Run '{}'...".format(key))
+            try:
+                result = measure(key, timer, repeat, number)
+            finally:
+                shutdown_executor()
+            if result is not None:
+                data[key] = result
+
+    run('determine_len', Timer('len(job_dirs(workspace))', setup=setup))
+
+    run('select_by_id', Timer(
+        stmt="load(os.path.join(workspace, jobid))",
+        setup=setup + "jobid = random.choice(os.listdir(workspace))"))
+
+    for suffix, setup_ in (('', setup), ('_threaded', setup_threaded)):
+        executor = 'executor' if suffix else 'None'
+
+        run('iterate' + suffix, Timer(
+            "statepoints(workspace, {})".format(executor), setup_), 3, 10)
+
+        run('iterate_single_pass' + suffix, Timer(
+            "statepoints(workspace, {})".format(executor), setup_), number=1)
+
+        run('search_lean_filter' + suffix, Timer(
+            stmt="len(find(workspace, f, {}))".format(executor),
+            setup=setup_ + "sp = load(random.choice(job_dirs(workspace))); "
+            "k, v = sp.popitem(); f = {k: v}"))
+
+        run('search_rich_filter' + suffix, Timer(
+            stmt="len(find(workspace, f, {}))".format(executor),
+            setup=setup_ + "f = load(random.choice(job_dirs(workspace)))"))
+
+    return data
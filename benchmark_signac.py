@@ -19,17 +19,26 @@
 # SOFTWARE.
 import os
 import six
-import string
-import random
-import timeit
-import warnings
+import json
+import shutil
+import itertools
 import logging
+from functools import partial
 from contextlib import contextmanager
 from collections import OrderedDict
-from multiprocessing import Pool
 
 import signac
-from tqdm import tqdm
+from signac.contrib.hashing import calc_id
+from signac.contrib.job import Job
+
+from generate import generate
+from queries import QueryGenerator
+from fixtures import clone_tree
+from teardown import temporary_directory
+from util import scan_workspace
+from util import size_histogram
+from measure import Timer
+from measure import measure_time
 
 if six.PY2:
     from tempdir import TemporaryDirectory
@@ -40,31 +49,6 @@ else:
 logger = logging.getLogger(__name__)
 
 
-class Timer(timeit.Timer):
-
-    def timeit(self, number=10):
-        return number, super().timeit(number=number)
-
-    def repeat(self, repeat=3, number=10):
-        return super().repeat(repeat=repeat, number=number)
-
-
-def size(fn):
-    try:
-        return os.path.getsize(fn)
-    except FileNotFoundError:
-        return 0
-
-
-def calc_project_metadata_size(project):
-    sp_size = []
-    doc_size = []
-    for job in tqdm(project, 'determine metadata size'):
-        sp_size.append(size(job.fn(job.FN_MANIFEST)))
-        doc_size.append(size(job.fn(job.FN_DOCUMENT)))
-    return sp_size, doc_size
-
-
 def fmt_size(size, units=None):
     "Returns a human readable string reprentation of bytes."
     if units is None:
@@ -83,12 +67,16 @@ def print_result(n, dt):
 
 
 def determine_project_size(project):
-    sp_size, doc_size = calc_project_metadata_size(project)
+    sizes = scan_workspace(project.workspace(), {
+        Job.FN_MANIFEST: 'statepoint', Job.FN_DOCUMENT: 'document'})
+    sp_size = [s.get('statepoint', 0) for s in sizes]
+    doc_size = [s.get('document', 0) for s in sizes]
     meta = {
-        'N': len(project),
+        'N': len(sizes),
         'statepoint_metadata_size': sum(sp_size),
         'document_metadata_size': sum(doc_size),
         'total': sum(sp_size) + sum(doc_size),
+        'histogram': size_histogram([a + b for a, b in zip(sp_size, doc_size)]),
     }
     return meta
 
@@ -97,74 +85,152 @@ def noop(*args, **kwarg):
     pass
 
 
-def _random_str(size):
-    return ''.join(random.choice(string.ascii_lowercase) for _ in range(size))
+def _write_json(fn, data):
+    with open(fn, 'w') as file:
+        file.write(json.dumps(data))
 
 
-def _make_doc(i, num_keys=1, data_size=0):
-    assert num_keys >= 1
-    assert data_size >= 0
+def _read_json(fn):
+    try:
+        with open(fn) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
 
-    doc = {'b_{}'.format(j): _random_str(data_size) for j in range(num_keys - 1)}
-    doc['a'] = '{}{}'.format(i, _random_str(max(0, data_size - len(str(i)))))
-    return doc
 
+def read_metadata(project):
+    "Returns the state point and document of all jobs read from the workspace."
+    records = []
+    for entry in os.scandir(project.workspace()):
+        sp = _read_json(os.path.join(entry.path, Job.FN_MANIFEST))
+        if sp is not None:
+            records.append({'sp': sp, 'doc': _read_json(os.path.join(entry.path, Job.FN_DOCUMENT))})
+    return records
 
-def _make_job(project, num_keys, num_doc_keys, data_size, data_std, i):
-    size = max(0, int(random.gauss(data_size, data_std)))
-    job = project.open_job(_make_doc(i, num_keys, size))
-    if num_doc_keys > 0:
-        size = max(0, int(random.gauss(data_size, data_std)))
-        job.document.update(_make_doc(i, num_doc_keys, size))
-    else:
-        job.init()
+
+def _write_jobs(workspace, jobs):
+    for i, sp, doc in jobs:
+        path = os.path.join(workspace, calc_id(sp))
+        os.mkdir(path)
+        _write_json(os.path.join(path, Job.FN_MANIFEST), sp)
+        if doc is not None:
+            _write_json(os.path.join(path, Job.FN_DOCUMENT), doc)
 
 
 def generate_random_data(project, N_sp, num_keys=1, num_doc_keys=0,
-                         data_size=0, data_std=0, parallel=True):
+                         data_size=0, data_std=0, seed=0, parallel=True, schema=None):
     assert len(project) == 0
 
-    if six.PY2:
-        if parallel:
-            warnings.warn("Function 'generate_random_data()' not parallelized for Python 2.")
-            parallel = False
+    workspace = project.workspace()
+    if not os.path.isdir(workspace):
+        os.makedirs(workspace)
+    generate(partial(_write_jobs, workspace), N_sp, num_keys, num_doc_keys,
+             data_size, data_std, seed=seed, parallel=parallel, schema=schema)
 
-    if parallel:
-        with Pool() as pool:
-            p = [(project, num_keys, num_doc_keys, data_size, data_std, i) for i in range(N_sp)]
-            list(pool.starmap(_make_job, tqdm(p, desc='init random project data')))
-    else:
-        from functools import partial
-        make = partial(_make_job, project, num_keys, num_doc_keys, data_size, data_std)
-        list(map(make, tqdm(range(N_sp), desc='init random project data')))
+
+def _init_random_project(root, N, num_keys, num_doc_keys, data_size, data_std, seed,
+                         schema=None):
+    project = signac.init_project('benchmark-N={}'.format(N), root=root)
+    generate_random_data(project, N, num_keys, num_doc_keys, data_size, data_std, seed,
+                         schema=schema)
 
 
 @contextmanager
 def setup_random_project(N, num_keys=1, num_doc_keys=0,
-                         data_size=0, data_std=0, seed=0, root=None):
-    random.seed(seed)
+                         data_size=0, data_std=0, seed=0, root=None, cache=None,
+                         schema=None, reaper=None):
     if not isinstance(N, int):
         raise TypeError("N must be an integer!")
 
-    with TemporaryDirectory(dir=root) as tmp:
-        project = signac.init_project('benchmark-N={}'.format(N), root=tmp)
-        generate_random_data(project, N, num_keys, num_doc_keys, data_size, data_std)
-        yield project
+    params = dict(N=N, num_keys=num_keys, num_doc_keys=num_doc_keys,
+                  data_size=data_size, data_std=data_std, seed=seed)
+    if schema is not None:
+        params['schema'] = schema
+    init = partial(_init_random_project, **params)
+    if cache is None:
+        with temporary_directory(root, reaper) as tmp:
+            init(tmp)
+            yield signac.get_project(root=tmp)
+    else:
+        params.update(tool='signac', version=signac.__version__)
+        with cache.fixture(params, init, dir=root, reaper=reaper) as tmp:
+            yield signac.get_project(root=tmp)
+
+
+class _Clone(object):
+    "A private copy of the project at root, which is restored in place between repeats."
+
+    def __init__(self, root):
+        self.root = root
+        self._tmp = TemporaryDirectory(dir=os.path.dirname(root))
+        self.path = self._tmp.name
+        clone_tree(root, self.path, ['reflink', 'copy'])
+        self.workspace = signac.get_project(root=self.path).workspace()
+        self._src = os.path.join(root, os.path.relpath(self.workspace, self.path))
+        self._names = set(os.listdir(self.workspace))
+        self.touched = set()
+
+    def restore(self):
+        "Restore the job directories that were touched, created or removed since the last call."
+        names = set(os.listdir(self.workspace))
+        for name in names.difference(self._names).union(self.touched):
+            shutil.rmtree(os.path.join(self.workspace, name), ignore_errors=True)
+        for name in self._names.difference(names).union(self.touched):
+            clone_tree(os.path.join(self._src, name), os.path.join(self.workspace, name),
+                       ['reflink', 'copy'])
+        self.touched.clear()
+
+    def cleanup(self):
+        self._tmp.cleanup()
+
+
+_clone = None
+
+
+def throwaway_project(root):
+    """Returns the project on a private copy of the project at root.
+
+    The copy is only created once, afterwards only the job directories
+    touched by the previous repeat are restored from root, such that the
+    cost of a repeat does not scale with the size of the project.
+    """
+    global _clone
+    if _clone is None or _clone.root != root:
+        discard_throwaway_project()
+        _clone = _Clone(root)
+    else:
+        _clone.restore()
+    return signac.get_project(root=_clone.path)
 
 
-def benchmark_project(project, keys=None):
+def throwaway_jobs(project):
+    "Cycles through the jobs of the throwaway project and marks them for restoration."
+    for job in itertools.cycle(list(project)):
+        _clone.touched.add(job.id)
+        yield job
+
+
+def discard_throwaway_project():
+    global _clone
+    if _clone is not None:
+        _clone.cleanup()
+        _clone = None
+
+
+def benchmark_project(project, keys=None, measure=measure_time):
     root = project.root_directory()
     setup = "import signac; project = signac.get_project(root='{}'); ".format(root)
     setup += "from itertools import islice, repeat; import random; "
     setup += "from benchmark_signac import noop;"
-    #setup_parallel = setup + "from multiprocessing import Pool; pool = Pool();"
 
     data = OrderedDict()
 
     def run(key, timer, repeat=3, number=10):
         if keys is None or key in keys:
             logger.info("Run '{}'...".format(key))
-            data[key] = timer.repeat(repeat=repeat, number=number)
+            result = measure(key, timer, repeat, number)
+            if result is not None:
+                data[key] = result
 
     run('determine_len', Timer('len(project)', setup=setup))
 
@@ -176,9 +242,6 @@ def benchmark_project(project, keys=None):
 
     run('iterate_single_pass', Timer("list(project)", setup), number=1)
 
-    #run('N_iterate', Timer("list(map(noop, project))", setup))
-    #run('N_iterate_parallel', Timer("list(pool.map(noop, project))", setup_parallel))
-
     run('search_lean_filter', Timer(
         stmt="len(project.find_jobs(f))",
         setup=setup + "sp = project.open_job(id=random.choice(list(project.find_job_ids()))).sp();"
@@ -188,4 +251,61 @@ def benchmark_project(project, keys=None):
         stmt="len(project.find_jobs(f))",
         setup=setup + "f = project.open_job(id=random.choice(list(project.find_job_ids()))).sp()"))
 
+    # All write categories operate on a throwaway copy of the project, which
+    # is restored before each repeat.
+    setup_write = "import itertools; from benchmark_signac import throwaway_project; "
+    setup_write += "from benchmark_signac import throwaway_jobs; "
+    setup_write += "project = throwaway_project('{}'); counter = itertools.count(); ".format(root)
+    setup_write += "jobs = throwaway_jobs(project);"
+
+    try:
+        run('init_jobs', Timer(
+            stmt="project.open_job({'init': next(counter)}).init()",
+            setup=setup_write), number=100)
+
+        run('update_document_single_key', Timer(
+            stmt="next(jobs).document['update'] = next(counter)",
+            setup=setup_write), number=100)
+
+        run('update_document_bulk', Timer(
+            stmt="next(jobs).document.update(doc)",
+            setup=setup_write + "doc = {'update_{}'.format(i): i for i in range(10)}"),
+            number=100)
+
+        run('reset_statepoint', Timer(
+            stmt="job = next(jobs); job.reset_statepoint(dict(job.sp(), reset=next(counter)))",
+            setup=setup_write))
+
+        run('update_statepoint', Timer(
+            stmt="next(jobs).update_statepoint({'update': next(counter)}, overwrite=True)",
+            setup=setup_write))
+
+        run('remove_job', Timer("next(jobs).remove()", setup_write), repeat=10, number=1)
+    finally:
+        discard_throwaway_project()
+
     return data
+
+
+def benchmark_queries(project, selectivities=None, seed=0, measure=measure_time):
+    """Time find_jobs() for filters of each operator class with controlled selectivity.
+
+    Returns a list of queries with the achieved selectivity and timing data.
+    """
+    root = project.root_directory()
+    setup = "import json; import signac; project = signac.get_project(root='{}'); ".format(root)
+    generator = QueryGenerator(read_metadata(project), seed=seed)
+
+    results = []
+    for query in generator(selectivities=selectivities):
+        logger.info("Run '{}' query with selectivity {}...".format(
+            query['operator'], query['target']))
+        matches = len(project.find_jobs(json.loads(query['filter'])))
+        query['matches'] = matches
+        query['selectivity'] = matches / generator.N
+        query['data'] = measure(
+            'query_{}:{:.0e}'.format(query['operator'], query['target']), Timer(
+                stmt="len(project.find_jobs(f))",
+                setup=setup + "f = json.loads({!r})".format(query['filter'])))
+        results.append(query)
+    return results
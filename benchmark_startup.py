@@ -0,0 +1,122 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import sys
+import json
+import shutil
+import logging
+import subprocess
+from time import perf_counter
+from collections import OrderedDict
+from collections import defaultdict
+
+import numpy as np
+
+from stats import summarize
+
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['interpreter', 'import', 'get_project_root', 'get_project_deep', 'open_job', 'process']
+
+STARTUP = """
+from time import perf_counter
+t0 = perf_counter()
+import signac
+t1 = perf_counter()
+project = signac.get_project()
+t2 = perf_counter()
+{}
+t3 = perf_counter()
+import sys, json
+sys.stdout.write(json.dumps([t1 - t0, t2 - t1, t3 - t2]))
+"""
+
+
+def _spawn(args, cwd):
+    "Execute a fresh interpreter and return its wall time, standard output and error."
+    start = perf_counter()
+    process = subprocess.run(
+        [sys.executable] + args, cwd=cwd, check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    return perf_counter() - start, process.stdout, process.stderr
+
+
+def parse_importtime(output):
+    "Returns the self and cumulative import time in seconds of each module from -X importtime."
+    times = OrderedDict()
+    for line in output.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            fields = line[len('import time:'):].split('|')
+            try:
+                times[fields[2].strip()] = (1e-6 * int(fields[0]), 1e-6 * int(fields[1]))
+            except ValueError:
+                continue
+    return times
+
+
+def benchmark_startup(project, repeat=10, depth=10, num_modules=50):
+    """Time the startup of fresh interpreters, which import signac, get the
+    project from its root and from a deep subdirectory, and open a job.
+    The 'process' stage is the wall time of the whole process.
+
+    Returns the single-pass timing data and the summary statistics of each
+    stage and the median import time of the slowest modules.
+    """
+    root = project.root_directory()
+    _id = next(iter(sorted(os.listdir(project.workspace()))))
+    deep = os.path.join(root, *['startup_{}'.format(i) for i in range(depth)])
+    os.makedirs(deep)
+
+    data = OrderedDict((stage, []) for stage in STAGES)
+    modules = defaultdict(list)
+    try:
+        for i in range(repeat):
+            logger.info("Run startup {}/{}...".format(i + 1, repeat))
+            data['interpreter'].append((1, _spawn(['-c', 'pass'], root)[0]))
+
+            dt, out, err = _spawn(
+                ['-c', STARTUP.format("project.open_job(id={!r})".format(_id))], root)
+            t_import, t_root, t_open = json.loads(out)
+            data['import'].append((1, t_import))
+            data['get_project_root'].append((1, t_root))
+            data['open_job'].append((1, t_open))
+            data['process'].append((1, dt))
+
+            dt, out, err = _spawn(['-c', STARTUP.format('pass')], deep)
+            data['get_project_deep'].append((1, json.loads(out)[1]))
+
+            dt, out, err = _spawn(['-X', 'importtime', '-c', 'import signac'], root)
+            for module, times in parse_importtime(err).items():
+                modules[module].append(times)
+    finally:
+        shutil.rmtree(os.path.join(root, 'startup_0'))
+
+    medians = sorted(((module, float(np.median([t[0] for t in times])),
+                       float(np.median([t[1] for t in times])))
+                      for module, times in modules.items()),
+                     key=lambda m: m[1], reverse=True)
+    return {
+        'depth': depth,
+        'data': data,
+        'stats': OrderedDict(
+            (stage, summarize([dt for n, dt in x], 1)) for stage, x in data.items()),
+        'importtime': [list(m) for m in medians[:num_modules]],
+    }
@@ -1,7 +1,18 @@
 import json
+import logging
 import argparse
 
-from report_benchmark import read_benchmark
+import numpy as np
+import pandas as pd
+
+from report_benchmark import read_samples
+from results import stream_results
+from stats import mann_whitney_u
+from calibration import host_index
+from calibration import category_index
+
+
+logger = logging.getLogger(__name__)
 
 
 result_columns = [
@@ -14,41 +25,139 @@ result_columns = [
 ]
 
 
+def read_calibration(filename, filter):
+    """Returns the fastest host calibration stored with the results or None
+    and the set of hosts the results were obtained on."""
+    filter = dict(filter or {})
+    filter['data'] = {'$exists': True}
+    docs = list(stream_results(filename, filter, ['meta', 'calibration']))
+    hosts = {(doc['meta']['platform']['node'], doc['meta']['fstype']) for doc in docs}
+    docs = [doc for doc in docs if 'calibration' in doc]
+    if docs:
+        return {metric: min(doc['calibration'][metric] for doc in docs)
+                for metric in docs[0]['calibration']}, hosts
+    return None, hosts
+
+
+def load_calibration(filename):
+    with open(filename) as file:
+        return json.load(file)
+
+
+def noise(x):
+    "Returns the robust coefficient of variation of x."
+    median = np.median(x)
+    return 1.4826 * np.median(np.abs(x - median)) / median if median > 0 else 0.0
+
+
 def main(args):
     filter = json.loads(args.filter) if args.filter else None
 
-    df = read_benchmark(args.filename, filter)
-    df_cmp = read_benchmark(args.filename_cmp, filter)
+    df = read_samples(args.filename, filter)
+    df_cmp = read_samples(args.filename_cmp, filter)
+    df = df[df.tool == args.tool]
+    df_cmp = df_cmp[df_cmp.tool == args.tool]
 
-    benchmark = df[df.tool == 'signac'][result_columns].min()
-    compare = df_cmp[df_cmp.tool == 'signac'][result_columns].min()
+    # Normalize the comparison to the speed of the benchmark host per category,
+    # unless both were obtained on the same host, where the calibration would
+    # only add noise.
+    calibration, hosts = read_calibration(args.filename, filter)
+    calibration_cmp, hosts_cmp = read_calibration(args.filename_cmp, filter)
+    if args.calibration:
+        calibration = load_calibration(args.calibration)
+    if args.calibration_cmp:
+        calibration_cmp = load_calibration(args.calibration_cmp)
+    normalized = comparable = True
+    if len(hosts.union(hosts_cmp)) == 1:
+        print("Results were obtained on the same host and filesystem, not normalized.")
+        normalized = False
+    elif calibration is None or calibration_cmp is None:
+        # The host running this script is not necessarily the benchmark host
+        # and unnormalized results of different hosts must not be gated on.
+        logger.warning("No calibration for {}, all cells are inconclusive.".format(
+            'the benchmark' if calibration is None else 'the comparison'))
+        comparable = False
+    else:
+        print("Host speed relative to the comparison: {:.2f}".format(
+            host_index(calibration_cmp) / host_index(calibration)))
 
-    # Calculate scores, where a score larger than 1 means the benchmark
-    # is faster than the comparison.
-    scores = compare / benchmark
-    print(scores)
-    print(scores.min())
-    if scores.min() < args.pass_above:
-        raise RuntimeError(
-            "The measured score ({}) is below the required minimal "
-            "score ({}).".format(scores.min(), args.pass_above))
+    # Compare each (N, category) cell, where a score larger than 1 means the
+    # benchmark is faster than the comparison. A difference is only considered
+    # significant if it exceeds the cell's noise and the minimal effect size.
+    rows = []
+    common_N = sorted(set(df.N).intersection(df_cmp.N))
+    for N in common_N:
+        for column in result_columns:
+            benchmark = df[(df.category == column) & (df.N == N)]['sample'].values
+            compare = df_cmp[(df_cmp.category == column) & (df_cmp.N == N)]['sample'].values
+            if len(benchmark) == 0 or len(compare) == 0:
+                continue
+            if normalized and comparable:
+                compare = compare * (category_index(calibration, column)
+                                     / category_index(calibration_cmp, column))
+            score = np.median(compare) / np.median(benchmark)
+            tolerance = max(1 - args.pass_above, args.noise_factor * np.sqrt(
+                noise(benchmark) ** 2 + noise(compare) ** 2))
+            u, p = mann_whitney_u(compare, benchmark)
+            if not comparable:
+                status = 'inconclusive'
+            elif p < args.alpha and score < 1 - tolerance:
+                status = 'regressed'
+            elif p < args.alpha and score > 1 + tolerance:
+                status = 'improved'
+            else:
+                status = 'inconclusive'
+            rows.append((N, column, score, tolerance, p, status))
+    if not rows:
+        raise RuntimeError("No common results to compare.")
+    scores = pd.DataFrame(
+        rows, columns=['N', 'category', 'score', 'tolerance', 'p-value', 'status'])
+    print(scores.to_string(index=False, float_format='{:.3f}'.format))
+
+    failed = scores[scores.status == 'regressed']
+    if len(failed):
+        raise RuntimeError("Regression in {} of {} cells: {}.".format(
+            len(failed), len(scores), ', '.join(
+                '{} (N={})'.format(row.category, row.N) for row in failed.itertuples())))
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        'filename', default='benchmark.txt', nargs='?',
-        help="The collection that contains the benchmark data.")
+        'filename', default='benchmark.db', nargs='?',
+        help="The result store that contains the benchmark data.")
     parser.add_argument(
         'filename_cmp', default='compare.txt', nargs='?')
     parser.add_argument(
         '-f', '--filter', type=str,
         help="Select a subset of the data.")
+    parser.add_argument(
+        '--tool', default='signac',
+        help="The tool to compare.")
+    parser.add_argument(
+        '--calibration', type=str,
+        help="A JSON file with the host calibration of the benchmark, "
+             "if it is not stored with the results.")
+    parser.add_argument(
+        '--calibration-cmp', type=str,
+        help="A JSON file with the host calibration of the comparison, "
+             "if it is not stored with the results.")
     parser.add_argument(
         '--pass-above',
         type=float,
         default=0.90,
-        help="Specify a minimal score that we need to pass.")
+        help="Specify a minimal score that we need to pass, unless the noise "
+             "of a cell requires a wider tolerance.")
+    parser.add_argument(
+        '--noise-factor',
+        type=float,
+        default=3.0,
+        help="The tolerance of each cell in multiples of its relative noise.")
+    parser.add_argument(
+        '--alpha',
+        type=float,
+        default=0.05,
+        help="The significance level below which a low score is considered a regression.")
     args = parser.parse_args()
 
     main(args)
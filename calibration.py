@@ -0,0 +1,74 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import json
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from measure import Timer
+from generate import make_job_data
+
+
+def _best(timer, number, repeat):
+    return min(dt / n for n, dt in timer.repeat(repeat=repeat, number=number))
+
+
+def calibrate_host(repeat=20, num_files=100):
+    """Returns the time per operation of a CPU, a stat() and a JSON parsing
+    microbenchmark on this host in seconds."""
+    calibration = dict()
+    calibration['cpu'] = _best(Timer("sum(i * i for i in range(1000))"), 100, repeat)
+
+    with TemporaryDirectory() as tmp:
+        fns = [os.path.join(tmp, str(i)) for i in range(num_files)]
+        for fn in fns:
+            open(fn, 'w').close()
+        timer = Timer("for fn in fns: stat(fn)", globals={'fns': fns, 'stat': os.stat})
+        calibration['stat'] = _best(timer, 10, repeat) / num_files
+
+    sp = json.dumps(make_job_data(0, 0, num_keys=10, data_size=100)[0])
+    timer = Timer("loads(sp)", globals={'sp': sp, 'loads': json.loads})
+    calibration['json'] = _best(timer, 1000, repeat)
+    return calibration
+
+
+# The calibration metrics that dominate each category, categories without
+# entry are scaled by all metrics.
+CATEGORY_METRICS = {
+    'determine_len': ['stat'],
+    'select_by_id': ['stat', 'json'],
+    'iterate': ['stat', 'json'],
+    'iterate_single_pass': ['stat', 'json'],
+    'search_lean_filter': ['json', 'cpu'],
+    'search_rich_filter': ['json', 'cpu'],
+}
+
+
+def host_index(calibration, metrics=None):
+    """Returns the geometric mean of the given or all calibration times as single
+    measure of the host speed."""
+    values = [calibration[m] for m in metrics or calibration]
+    return float(np.exp(np.mean(np.log(values))))
+
+
+def category_index(calibration, category):
+    "Returns the host speed for the metrics that dominate category."
+    return host_index(calibration, CATEGORY_METRICS.get(category))
@@ -24,4 +24,23 @@ COMPLEXITY = {
     'search_rich_filter': 'N',
     'determine_len': 'N',
     'select_by_id': '1',
+    'init_jobs': '1',
+    'update_document_single_key': '1',
+    'update_document_bulk': '1',
+    'reset_statepoint': '1',
+    'update_statepoint': '1',
+    'remove_job': '1',
+    'iterate_threaded': 'N',
+    'iterate_single_pass_threaded': 'N',
+    'search_lean_filter_threaded': 'N',
+    'search_rich_filter_threaded': 'N',
 }
+
+WRITE_CATEGORIES = [
+    'init_jobs',
+    'update_document_single_key',
+    'update_document_bulk',
+    'reset_statepoint',
+    'update_statepoint',
+    'remove_job',
+]
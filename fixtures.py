@@ -0,0 +1,236 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import six
+import json
+import time
+import errno
+import fcntl
+import shutil
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from tempfile import mkdtemp
+
+from teardown import temporary_directory
+
+if six.PY2:
+    from tempdir import TemporaryDirectory
+else:
+    from tempfile import TemporaryDirectory
+
+
+logger = logging.getLogger(__name__)
+
+FN_FIXTURE = 'fixture.json'
+
+# The Linux ioctl request to share the extents of one file with another.
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except (IOError, OSError):
+            os.remove(dst)
+            raise
+
+
+CLONE_METHODS = OrderedDict([
+    ('reflink', _reflink),
+    ('hardlink', os.link),
+    ('copy', shutil.copyfile),
+])
+
+
+def clone_tree(src, dst, method='auto'):
+    """Clone the directory tree src into the existing directory dst.
+
+    Files are cloned with the first supported method in the order
+    reflink, hardlink, copy, unless a specific method or list of methods
+    is requested. Returns the name of the method that was used.
+    """
+    if method == 'auto':
+        methods = list(CLONE_METHODS)
+    else:
+        methods = [method] if isinstance(method, str) else list(method)
+    for dirpath, dirnames, filenames in os.walk(src):
+        target = os.path.normpath(os.path.join(dst, os.path.relpath(dirpath, src)))
+        if not os.path.isdir(target):
+            os.mkdir(target)
+        for fn in filenames:
+            while True:
+                try:
+                    CLONE_METHODS[methods[0]](os.path.join(dirpath, fn), os.path.join(target, fn))
+                    break
+                except (IOError, OSError):
+                    if len(methods) == 1:
+                        raise
+                    logger.debug("Clone method '{}' not supported.".format(methods.pop(0)))
+    return methods[0]
+
+
+@contextmanager
+def writable_clone(src, dir=None):
+    "Yield the path to a temporary clone of src, which may be modified freely."
+    with TemporaryDirectory(dir=dir) as tmp:
+        clone_tree(src, tmp, ['reflink', 'copy'])
+        yield tmp
+
+
+def tree_size(path):
+    "Returns the total size of all files within path in bytes."
+    return sum(os.path.getsize(os.path.join(dirpath, fn))
+               for dirpath, dirnames, filenames in os.walk(path) for fn in filenames)
+
+
+def _set_readonly(path):
+    for dirpath, dirnames, filenames in os.walk(path):
+        for fn in filenames:
+            os.chmod(os.path.join(dirpath, fn), 0o444)
+
+
+def _modified_since(path, timestamp):
+    for dirpath, dirnames, filenames in os.walk(path):
+        for fn in filenames:
+            if os.path.getmtime(os.path.join(dirpath, fn)) > timestamp:
+                return True
+    return False
+
+
+class FixtureCache(object):
+    """An on-disk cache of generated benchmark fixtures.
+
+    Fixtures are stored under a hash of their generation parameters and
+    evicted in least-recently-used order once the cache exceeds max_size
+    bytes. Benchmarks only ever operate on clones of the cached master copy.
+    """
+
+    def __init__(self, root, max_size=None):
+        self.root = os.path.abspath(root)
+        self.max_size = max_size
+        self.info = None
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+
+    def __repr__(self):
+        return "{}(root={!r}, max_size={!r})".format(type(self).__name__, self.root, self.max_size)
+
+    @staticmethod
+    def key(params):
+        "Returns the cache key of the given generation parameters."
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key, *args):
+        return os.path.join(self.root, key, *args)
+
+    @contextmanager
+    def _lock(self, key, blocking=True):
+        with open(os.path.join(self.root, key + '.lock'), 'w') as lockfile:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            fcntl.flock(lockfile.fileno(), flags)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockfile.fileno(), fcntl.LOCK_UN)
+
+    def _read_meta(self, key):
+        with open(self._path(key, FN_FIXTURE)) as file:
+            return json.load(file)
+
+    def _build(self, key, params, init):
+        logger.info("Generate fixture '{}'...".format(key))
+        tmp = mkdtemp(prefix=key + '.tmp-', dir=self.root)
+        try:
+            data = os.path.join(tmp, 'data')
+            os.mkdir(data)
+            init(data)
+            _set_readonly(data)
+            meta = {'params': params, 'size': tree_size(data), 'created': time.time()}
+            with open(os.path.join(tmp, FN_FIXTURE), 'w') as file:
+                json.dump(meta, file)
+            os.rename(tmp, self._path(key))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def entries(self):
+        "Returns all cache keys in least-recently-used order."
+        entries = [key for key in os.listdir(self.root)
+                   if os.path.isfile(self._path(key, FN_FIXTURE))]
+        return sorted(entries, key=lambda key: os.path.getmtime(self._path(key, FN_FIXTURE)))
+
+    def remove(self, key):
+        logger.info("Remove fixture '{}'.".format(key))
+        shutil.rmtree(self._path(key))
+
+    def evict(self, keep=()):
+        "Remove least recently used fixtures until the cache fits into max_size."
+        if self.max_size is None:
+            return
+        entries = self.entries()
+        sizes = {key: self._read_meta(key)['size'] for key in entries}
+        total = sum(sizes.values())
+        for key in entries:
+            if total <= self.max_size:
+                break
+            if key in keep:
+                continue
+            try:
+                with self._lock(key, blocking=False):
+                    self.remove(key)
+            except (IOError, OSError) as error:
+                if error.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+                logger.debug("Fixture '{}' is in use, not evicted.".format(key))
+            else:
+                total -= sizes[key]
+
+    @contextmanager
+    def fixture(self, params, init, dir=None, reaper=None):
+        """Yield the path to a private clone of the fixture for params.
+
+        The fixture is generated by calling init(path) on a cache miss.
+        The clone is deleted by reaper if provided.
+        """
+        key = self.key(params)
+        with self._lock(key):
+            hit = os.path.isdir(self._path(key))
+            if not hit:
+                self._build(key, params, init)
+            os.utime(self._path(key, FN_FIXTURE), None)
+            created = self._read_meta(key)['created']
+            tmp = temporary_directory(dir, reaper)
+            method = clone_tree(self._path(key, 'data'), tmp.name)
+        self.info = {'key': key, 'hit': hit, 'clone': method}
+        self.evict(keep=(key,))
+        try:
+            with tmp:
+                yield tmp.name
+        finally:
+            if method == 'hardlink':
+                with self._lock(key):
+                    if _modified_since(self._path(key, 'data'), created):
+                        logger.warning(
+                            "Fixture '{}' was modified through a hardlinked clone, "
+                            "removing it from the cache.".format(key))
+                        self.remove(key)
@@ -0,0 +1,118 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import six
+import string
+import warnings
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+from tqdm import tqdm
+
+from schemas import Schema
+
+
+ALPHABET = np.frombuffer(string.ascii_lowercase.encode(), dtype=np.uint8)
+
+
+def cpu_count():
+    "Returns the number of CPUs available to this process."
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def job_rng(seed, i):
+    "Returns the random number generator of the i-th job for the given seed."
+    return np.random.default_rng([seed, i])
+
+
+def _random_strs(rng, num, size):
+    chars = ALPHABET[rng.integers(0, len(ALPHABET), size=num * size)].tobytes().decode()
+    return [chars[k * size:(k + 1) * size] for k in range(num)]
+
+
+def _make_doc(rng, i, num_keys=1, data_size=0):
+    assert num_keys >= 1
+    assert data_size >= 0
+
+    values = _random_strs(rng, num_keys, data_size)
+    doc = {'b_{}'.format(j): values[j] for j in range(num_keys - 1)}
+    doc['a'] = '{}{}'.format(i, values[-1][:max(0, data_size - len(str(i)))])
+    return doc
+
+
+def make_job_data(seed, i, num_keys=1, num_doc_keys=0, data_size=0, data_std=0, schema=None):
+    """Returns the state point and document (or None) of the i-th job.
+
+    The result only depends on the seed and the index, all values are drawn
+    from the job's own random stream in one batch per document. The state
+    point and document are generated from the schema instead, if provided.
+    """
+    rng = job_rng(seed, i)
+    if schema is not None:
+        if not isinstance(schema, Schema):
+            schema = Schema(schema, seed)
+        return schema.make_job_data(rng, i)
+    sp_size, doc_size = np.maximum(0, rng.normal(data_size, data_std, size=2)).astype(int)
+    sp = _make_doc(rng, i, num_keys, int(sp_size))
+    doc = _make_doc(rng, i, num_doc_keys, int(doc_size)) if num_doc_keys > 0 else None
+    return sp, doc
+
+
+def _generate_chunk(write, seed, params, chunk):
+    start, stop = chunk
+    write([(i,) + make_job_data(seed, i, **params) for i in range(start, stop)])
+    return stop - start
+
+
+def generate(write, N, num_keys=1, num_doc_keys=0, data_size=0, data_std=0, seed=0,
+             parallel=True, processes=None, chunksize=1000, desc='init random project data',
+             schema=None):
+    """Generate N jobs and pass them in chunks of (i, sp, doc) tuples to write().
+
+    Since every job is generated from its own random stream, the generated
+    data is identical for any number of processes and any chunk size. The
+    write() function must be picklable for parallel execution. The metadata
+    is generated from the given schema specification instead of the num_keys,
+    num_doc_keys, data_size and data_std arguments, if provided.
+    """
+    if six.PY2:
+        if parallel:
+            warnings.warn("Function 'generate()' not parallelized for Python 2.")
+            parallel = False
+
+    params = dict(num_keys=num_keys, num_doc_keys=num_doc_keys,
+                  data_size=data_size, data_std=data_std)
+    if schema is not None:
+        params['schema'] = Schema(schema, seed)
+    chunks = [(start, min(N, start + chunksize)) for start in range(0, N, chunksize)]
+    task = partial(_generate_chunk, write, seed, params)
+
+    with tqdm(total=N, desc=desc) as progress:
+        if parallel and len(chunks) > 1:
+            with Pool(processes or cpu_count()) as pool:
+                for n in pool.imap_unordered(task, chunks):
+                    progress.update(n)
+        else:
+            for chunk in chunks:
+                progress.update(task(chunk))
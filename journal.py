@@ -0,0 +1,196 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import json
+import fcntl
+import logging
+
+from results import meta_hash
+
+
+logger = logging.getLogger(__name__)
+
+
+class Journal(object):
+    """A journal of the partial results of one configuration.
+
+    Every completed category and result section is appended to the journal
+    file immediately. When resumed, completed categories and sections are
+    restored from the journal instead of being measured again. Entries of
+    configurations that were restarted are ignored and the entries of
+    stored configurations are removed from the journal. A journal
+    without filename only passes through all measurements.
+    """
+
+    def __init__(self, filename, key, resume=False):
+        self.filename = filename
+        self.id = meta_hash(key)
+        self._entries = dict()
+        self._doc = None
+        self._tracked = []
+        if filename is not None:
+            if resume:
+                self._entries = self._load()
+                if self._entries:
+                    logger.info("Resume {} entries from journal '{}'.".format(
+                        len(self._entries), filename))
+            else:
+                self._append({'start': True})
+
+    def __repr__(self):
+        return "{}(filename={!r}, id={!r})".format(type(self).__name__, self.filename, self.id)
+
+    def _load(self):
+        entries = dict()
+        try:
+            with open(self.filename) as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning("Skip incomplete entry in journal '{}'.".format(
+                            self.filename))
+                        continue
+                    if record.get('id') != self.id:
+                        continue
+                    if 'section' in record:
+                        entries[(record['section'], record.get('category'))] = record
+                    else:
+                        entries = dict()
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _append(self, record):
+        if self.filename is None:
+            return
+        record['id'] = self.id
+        while True:
+            with open(self.filename, 'a') as file:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+                try:
+                    # The journal may have been removed by _compact() while waiting.
+                    if os.fstat(file.fileno()).st_nlink == 0:
+                        continue
+                    file.write(json.dumps(record) + '\n')
+                    file.flush()
+                    os.fsync(file.fileno())
+                    return
+                finally:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+    def _keep(self, line):
+        try:
+            return json.loads(line).get('id') != self.id
+        except ValueError:
+            return False
+
+    def _compact(self):
+        "Remove all entries of this configuration and the journal once it is empty."
+        try:
+            file = open(self.filename, 'r+')
+        except FileNotFoundError:
+            return
+        with file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.fstat(file.fileno()).st_nlink == 0:
+                    return
+                lines = [line for line in file if self._keep(line)]
+                if lines:
+                    file.seek(0)
+                    file.writelines(lines)
+                    file.truncate()
+                    file.flush()
+                    os.fsync(file.fileno())
+                else:
+                    os.remove(self.filename)
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+    def track(self, doc, names):
+        """Journal the entries added to the doc sections named by names together
+        with every category and section and restore them on resume."""
+        self._doc = doc
+        self._tracked = list(names)
+
+    def _snapshot(self):
+        return {name: set(self._doc[name]) for name in self._tracked}
+
+    def _added(self, snapshot):
+        return {name: {k: v for k, v in self._doc[name].items() if k not in keys}
+                for name, keys in snapshot.items()}
+
+    def _restore(self, record):
+        for name, entries in record.get('extra', {}).items():
+            self._doc[name].update(entries)
+        return record['value']
+
+    def call(self, section, func, *args, **kwargs):
+        "Returns the journaled result of section or the result of func(*args, **kwargs)."
+        record = self._entries.get((section, None))
+        if record is None:
+            snapshot = self._snapshot()
+            value = func(*args, **kwargs)
+            self._append({'section': section, 'value': value, 'extra': self._added(snapshot)})
+            return value
+        return self._restore(record)
+
+    def check(self, section, value):
+        """Journal value or, when resumed, discard all restored entries if the
+        journaled value differs, e.g., because the data space changed."""
+        record = self._entries.get((section, None))
+        if record is not None and record['value'] == value:
+            return
+        if record is not None:
+            logger.warning("The {} differs from the journal '{}', measure all categories "
+                           "again.".format(section, self.filename))
+            self._entries = dict()
+            self._append({'start': True})
+        self._append({'section': section, 'value': value, 'extra': {}})
+
+    def measure(self, section, measure):
+        "Returns a measurement, which journals the result of each category."
+        def journaled(key, timer, repeat=3, number=10):
+            record = self._entries.get((section, key))
+            if record is None:
+                snapshot = self._snapshot()
+                value = measure(key, timer, repeat, number)
+                self._append({
+                    'section': section, 'category': key, 'value': value,
+                    'extra': self._added(snapshot)})
+                return value
+            logger.info("Restore '{}' from journal.".format(key))
+            return self._restore(record)
+        return journaled
+
+    def done(self):
+        "Mark the configuration as stored and remove its entries from the journal."
+        if self.filename is None:
+            return
+        self._append({'done': True})
+        self._compact()
+
+
+def finish(filename, key):
+    "Remove the entries of the stored configuration identified by key from the journal."
+    journal = Journal(None, key)
+    journal.filename = filename
+    journal.done()
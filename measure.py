@@ -0,0 +1,332 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import gc
+import signal
+import timeit
+import itertools
+import resource
+import tracemalloc
+from contextlib import contextmanager
+
+import psutil
+
+from stats import adaptive_repeat
+from stats import calibrate
+
+
+class Timer(timeit.Timer):
+
+    def __init__(self, stmt='pass', setup='pass', *args, **kwargs):
+        super().__init__(stmt, setup, *args, **kwargs)
+        self.stmt = stmt
+        self.setup = setup
+        self.record = None
+        self.counter = None
+        self.iterations = 0
+        # The number of loops per repeat, if chosen by the measurement.
+        self.number = None
+
+    def timeit(self, number=10):
+        if self.record is None:
+            result = number, super().timeit(number=number)
+            self.iterations += number
+            return result
+        # Count the iterations to be able to account for interrupted loops.
+        self.counter = itertools.count()
+        it = itertools.islice(self.counter, number)
+        gcold = gc.isenabled()
+        gc.disable()
+        try:
+            result = number, self.inner(it, self.timer)
+        finally:
+            if gcold:
+                gc.enable()
+        self.iterations += number
+        self.record.append(result)
+        return result
+
+    def repeat(self, repeat=3, number=10):
+        return super().repeat(repeat=repeat, number=number)
+
+
+def measure_time(key, timer, repeat=3, number=10):
+    "The default measurement, returns a list of (number, time) tuples."
+    return timer.repeat(repeat=repeat, number=number)
+
+
+def measure_adaptive(stats, target_time=0.2, **kwargs):
+    """Returns a measurement, which repeats each category adaptively and stores
+    the summary statistics of each category in stats.
+
+    Categories that are timed in single passes are not calibrated. The
+    calibrated number of loops is stored as the timer's number and the
+    calibration runs are not recorded as repeats.
+    """
+    def measure(key, timer, repeat=3, number=10):
+        if number != 1:
+            # A category interrupted during the calibration exceeds a single loop.
+            timer.number = 1
+            number = calibrate(timer, target_time)
+            if timer.record is not None:
+                del timer.record[:]
+        timer.number = number
+        data, stats[key] = adaptive_repeat(
+            timer, number=number, target_time=target_time, **kwargs)
+        return data
+    return measure
+
+
+class BudgetExceeded(BaseException):
+    "Raised asynchronously, derived from BaseException to not be caught by benchmarked code."
+
+
+def _interrupted(timer, exc):
+    "Returns the number of started iterations and their time when timer was interrupted."
+    now = timer.timer()
+    if timer.counter is None:
+        return None
+    tb = exc.__traceback__
+    while tb is not None:
+        if tb.tb_frame.f_code.co_name == 'inner' and '_t0' in tb.tb_frame.f_locals:
+            return next(timer.counter), now - tb.tb_frame.f_locals['_t0']
+        tb = tb.tb_next
+    return None
+
+
+def _raise(signum, frame):
+    raise BudgetExceeded()
+
+
+@contextmanager
+def _alarm(budget):
+    previous = signal.signal(signal.SIGALRM, _raise)
+    signal.setitimer(signal.ITIMER_REAL, budget)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def measure_budget(truncated, budget, measure=measure_time, variant=None):
+    """Returns a measurement, which interrupts each category after budget seconds.
+
+    The completed repeats of an interrupted category are kept. If not even
+    one repeat was completed, the time of the started iterations is recorded
+    as lower bound. The time of a repeat is extrapolated with the number of
+    loops chosen by the measurement, e.g., the adaptively calibrated one.
+    Categories interrupted before their first iteration, e.g., during the
+    setup, have no result. Interrupted categories are recorded in truncated,
+    the names of other passes than the timing are suffixed with the variant.
+    """
+    def measure_(key, timer, repeat=3, number=10):
+        name = key if variant is None else '{}:{}'.format(key, variant)
+        timer.record = []
+        try:
+            with _alarm(budget):
+                return measure(key, timer, repeat, number)
+        except BudgetExceeded as exc:
+            data = list(timer.record)
+            lower_bound = not data
+            if lower_bound:
+                interrupted = _interrupted(timer, exc)
+                if interrupted is None:
+                    truncated[name] = {
+                        'budget': budget, 'repeats': 0,
+                        'lower_bound': False, 'extrapolated': None}
+                    return None
+                data = [interrupted]
+            truncated[name] = {
+                'budget': budget,
+                'repeats': len(data),
+                'lower_bound': lower_bound,
+                'extrapolated': (timer.number or number) * min(dt / n for n, dt in data),
+            }
+            return data
+        finally:
+            timer.record = None
+    return measure_
+
+
+def call_budget(truncated, key, budget, func, *args, **kwargs):
+    """Returns the result of func(*args, **kwargs) or None if it did not complete
+    within budget seconds, which is recorded in truncated."""
+    try:
+        with _alarm(budget):
+            return func(*args, **kwargs)
+    except BudgetExceeded:
+        truncated[key] = {'budget': budget, 'repeats': 0,
+                          'lower_bound': False, 'extrapolated': None}
+        return None
+
+
+def measure_cold(root):
+    """Returns a measurement, which evicts all files below root from the
+    page cache prior to each single timed pass."""
+    def measure(key, timer, repeat=3, number=10):
+        setup = timer.setup + "\nfrom pagecache import evict; evict({!r})".format(root)
+        cold = Timer(timer.stmt, setup)
+        cold.record = timer.record
+        timer.number = 1
+        try:
+            return cold.repeat(repeat=repeat, number=1)
+        finally:
+            timer.counter = cold.counter
+    return measure
+
+
+def _vm_hwm():
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    raise LookupError('VmHWM')
+
+
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _peak_rss():
+    try:
+        return _vm_hwm()
+    except (IOError, OSError, LookupError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure_memory(key, timer, repeat=3, number=10):
+    """Measure the memory usage of a single execution of the timer's statement.
+
+    Returns the increase of the peak resident set size, the tracemalloc peak
+    and the allocations retained after the execution, all in bytes. The peak
+    RSS increase is None where the peak can not be reset, since the peak of
+    the process, e.g., during the data space generation, would mask it.
+    """
+    code = compile(timer.stmt, '<memory-src>', 'exec')
+
+    peak_rss = None
+    ns = dict()
+    exec(timer.setup, ns)
+    gc.collect()
+    if _reset_peak_rss():
+        rss = psutil.Process().memory_info().rss
+        exec(code, ns)
+        peak_rss = max(0, _peak_rss() - rss)
+
+    ns = dict()
+    exec(timer.setup, ns)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        exec(code, ns)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'peak_rss': peak_rss, 'tracemalloc_peak': peak, 'retained': retained}
+
+
+IO_FIELDS = ('rchar', 'wchar', 'syscr', 'syscw', 'read_bytes')
+
+
+def _io_counters():
+    counters = dict()
+    try:
+        with open('/proc/self/io') as file:
+            for line in file:
+                name, value = line.split(':')
+                if name in IO_FIELDS:
+                    counters[name] = int(value)
+    except (IOError, OSError):
+        pass
+    counters['ctx_switches'] = sum(psutil.Process().num_ctx_switches())
+    return counters
+
+
+def _io_delta(before, after, baseline=None):
+    baseline = baseline or dict()
+    return {k: after[k] - before[k] - baseline.get(k, 0) for k in after if k in before}
+
+
+def _num_fds():
+    process = psutil.Process()
+    try:
+        return process.num_fds()
+    except AttributeError:
+        return len(process.open_files())
+
+
+class _SetupCounters(object):
+    "Accumulates the I/O counters of all setup executions of an instrumented timer."
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.runs = 0
+        self.total = dict()
+
+    def begin(self):
+        self._before = _io_counters()
+
+    def end(self):
+        for k, v in _io_delta(self._before, _io_counters(), self.baseline).items():
+            self.total[k] = self.total.get(k, 0) + v
+        self.runs += 1
+
+
+def measure_io(io, measure=measure_time, N=None):
+    """Returns a measurement, which records the I/O counters and context
+    switches per iteration of each category in io.
+
+    The timer's setup is instrumented to subtract the counters of every
+    setup execution, including those of calibration runs, and of the two
+    snapshots around it. The counters are
+    divided by the number of iterations counted by the timer and, if N is
+    provided, additionally by the number of jobs as 'per_job'. The number of
+    files left open by a category is recorded as 'open_files'.
+    """
+    def measure_(key, timer, repeat=3, number=10):
+        snapshot = _io_counters()
+        baseline = _io_delta(snapshot, _io_counters())
+        setup = _SetupCounters(baseline)
+        instrumented = Timer(
+            timer.stmt, "_setup_io.begin()\n{}\n_setup_io.end()".format(timer.setup),
+            globals={'_setup_io': setup})
+
+        fds = _num_fds()
+        before = _io_counters()
+        data = measure(key, instrumented, repeat, number)
+        if data is None:
+            return data
+        total = _io_delta(before, _io_counters(), baseline)
+        open_files = _num_fds() - fds
+
+        iterations = max(1, instrumented.iterations)
+        io[key] = {k: max(0, v - setup.total.get(k, 0) - 2 * setup.runs * baseline.get(k, 0))
+                   / iterations for k, v in total.items()}
+        if N:
+            io[key]['per_job'] = {k: v / N for k, v in io[key].items()}
+        io[key]['open_files'] = open_files
+        return data
+    return measure_
@@ -0,0 +1,100 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import mmap
+import ctypes
+import ctypes.util
+import logging
+from itertools import islice
+
+
+logger = logging.getLogger(__name__)
+
+PAGESIZE = mmap.PAGESIZE
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _mincore = _libc.mincore
+    _mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+except (OSError, AttributeError):
+    _mincore = None
+
+
+def _files(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        for fn in filenames:
+            yield os.path.join(dirpath, fn)
+
+
+def evict(root):
+    """Evict all files below root from the page cache.
+
+    Dirty pages are flushed first, since they cannot be dropped otherwise.
+    This does not require any special privileges, but has no effect on
+    file systems that are backed by memory, such as tmpfs.
+    """
+    for fn in _files(root):
+        fd = os.open(fn, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def resident_pages(fn):
+    "Returns the number of resident and total pages of the file fn."
+    size = os.path.getsize(fn)
+    if size == 0:
+        return 0, 0
+    pages = (size + PAGESIZE - 1) // PAGESIZE
+    vec = (ctypes.c_ubyte * pages)()
+    with open(fn, 'rb') as file:
+        mm = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_COPY)
+        try:
+            buf = ctypes.c_char.from_buffer(mm)
+            try:
+                if _mincore(ctypes.addressof(buf), size, vec) != 0:
+                    raise OSError(ctypes.get_errno(), "mincore() failed for '{}'.".format(fn))
+            finally:
+                del buf
+        finally:
+            mm.close()
+    return sum(v & 1 for v in vec), pages
+
+
+def verify_eviction(root, max_files=1000):
+    """Evict all files below root and check the page cache residency of
+    up to max_files of them."""
+    evict(root)
+    result = {'verified': None, 'files': 0, 'pages': 0, 'resident_pages': 0}
+    if _mincore is None:
+        logger.warning("Unable to verify page cache eviction, mincore() is not available.")
+        return result
+    for fn in islice(_files(root), max_files):
+        resident, pages = resident_pages(fn)
+        result['files'] += 1
+        result['pages'] += pages
+        result['resident_pages'] += resident
+    result['verified'] = result['resident_pages'] == 0
+    if not result['verified']:
+        logger.warning("{} of {} sampled pages are still resident after eviction.".format(
+            result['resident_pages'], result['pages']))
+    return result
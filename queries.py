@@ -0,0 +1,188 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import re
+import json
+import math
+import random
+from collections.abc import Mapping
+from collections import Counter
+from collections import OrderedDict
+from collections import defaultdict
+
+
+SELECTIVITIES = [0.0001, 0.001, 0.01, 0.1, 0.5]
+
+# The presence of a key must be within this factor of the target selectivity
+# to be used for an $exists query.
+EXISTS_TOLERANCE = 2
+
+OPERATORS = ['range', 'in', 'regex', 'exists', 'nested', 'doc', 'and', 'or']
+
+
+def flatten(mapping, prefix=''):
+    "Yields all (dotted key, value) pairs of a nested mapping."
+    for key, value in mapping.items():
+        if isinstance(value, Mapping):
+            for item in flatten(value, prefix + key + '.'):
+                yield item
+        else:
+            yield prefix + key, value
+
+
+def _kind(value):
+    if isinstance(value, str):
+        return str
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float
+
+
+def _columns(docs):
+    "Returns the sorted values of all keys with comparable values."
+    columns = defaultdict(list)
+    for doc in docs:
+        for key, value in flatten(doc):
+            if _kind(value) is not None:
+                columns[key].append(value)
+    for key, values in columns.items():
+        kind = Counter(_kind(v) for v in values).most_common(1)[0][0]
+        columns[key] = sorted(v for v in values if _kind(v) is kind)
+    return columns
+
+
+class QueryGenerator(object):
+    """Generate filters with a target selectivity from the metadata of a data space.
+
+    The filters are constructed from the distribution of the actual values,
+    the achieved selectivity must be determined by executing the query.
+    """
+
+    def __init__(self, records, seed=0):
+        self.N = len(records)
+        self.sp = _columns(record['sp'] for record in records)
+        self.presence = Counter(key for record in records for key, _ in flatten(record['sp']))
+        self.doc = _columns(record.get('doc') or {} for record in records)
+        self.random = random.Random(seed)
+
+    def _key(self, columns, nested=False):
+        keys = sorted(k for k in columns if ('.' in k) == nested)
+        if keys:
+            return self.random.choice(keys)
+
+    def _range(self, columns, key, selectivity, prefix=''):
+        values = columns[key]
+        m = max(1, int(round(selectivity * self.N)))
+        i = self.random.randint(0, max(0, len(values) - m))
+        expr = {'$gte': values[i]}
+        if i + m < len(values):
+            if values[i + m] == values[i]:
+                expr['$lte'] = values[i]
+            else:
+                expr['$lt'] = values[i + m]
+        return {prefix + key: expr}
+
+    def _in(self, key, selectivity):
+        counts = Counter(self.sp[key])
+        values = sorted(counts)
+        self.random.shuffle(values)
+        m = max(1, int(round(selectivity * self.N)))
+        selected, n = [], 0
+        for value in values:
+            if n >= m:
+                break
+            selected.append(value)
+            n += counts[value]
+        return {key: {'$in': sorted(selected)}}
+
+    def _regex(self, key, selectivity):
+        values = self.sp[key]
+        m = max(1, int(round(selectivity * self.N)))
+        length = 1
+        while length < 8 and len(values) / 26 ** length > m:
+            length += 1
+        counts = Counter(v[:length] for v in values)
+        prefixes = sorted(counts)
+        self.random.shuffle(prefixes)
+        selected, n = [], 0
+        for prefix in prefixes:
+            if n >= m:
+                break
+            selected.append(re.escape(prefix))
+            n += counts[prefix]
+        return {key: {'$regex': '^(?:{})'.format('|'.join(sorted(selected)))}}
+
+    def _exists(self, selectivity):
+        """Returns the $exists clause with the selectivity closest to the target or None
+        if the presence of no key is within EXISTS_TOLERANCE of the target."""
+        candidates = []
+        for key, n in sorted(self.presence.items()):
+            candidates.append((n / self.N, {key: {'$exists': True}}))
+            candidates.append((1 - n / self.N, {key: {'$exists': False}}))
+        candidates = [(s, f) for s, f in candidates
+                      if s > 0 and max(s / selectivity, selectivity / s) < EXISTS_TOLERANCE]
+        if candidates:
+            return min(candidates, key=lambda c: abs(math.log(c[0] / selectivity)))[1]
+
+    def make_filter(self, operator, selectivity):
+        "Returns a filter for the given operator class or None if not applicable."
+        key = self._key(self.sp)
+        if key is None:
+            return None
+        if operator == 'range':
+            return self._range(self.sp, key, selectivity)
+        elif operator == 'in':
+            return self._in(key, selectivity)
+        elif operator == 'regex':
+            str_keys = sorted(k for k in self.sp if '.' not in k and _kind(self.sp[k][0]) is str)
+            if str_keys:
+                return self._regex(self.random.choice(str_keys), selectivity)
+        elif operator == 'exists':
+            return self._exists(selectivity)
+        elif operator == 'nested':
+            nested = self._key(self.sp, nested=True)
+            if nested is not None:
+                return self._range(self.sp, nested, selectivity)
+        elif operator == 'doc':
+            doc_key = self._key(self.doc)
+            if doc_key is not None:
+                return self._range(self.doc, doc_key, selectivity, prefix='doc.')
+        elif operator in ('and', 'or'):
+            keys = sorted(k for k in self.sp if '.' not in k)
+            if len(keys) >= 2:
+                a, b = self.random.sample(keys, 2)
+                if operator == 'and':
+                    s = math.sqrt(selectivity)
+                    return {'$and': [self._range(self.sp, a, s), self._range(self.sp, b, s)]}
+                else:
+                    s = selectivity / 2
+                    return {'$or': [self._range(self.sp, a, s), self._range(self.sp, b, s)]}
+        else:
+            raise ValueError("Unknown operator class '{}'.".format(operator))
+
+    def __call__(self, operators=None, selectivities=None):
+        "Yields a query for each applicable operator class and target selectivity."
+        for operator in operators or OPERATORS:
+            for selectivity in selectivities or SELECTIVITIES:
+                filter = self.make_filter(operator, selectivity)
+                if filter is not None:
+                    yield OrderedDict([
+                        ('operator', operator),
+                        ('target', selectivity),
+                        ('filter', json.dumps(filter, sort_keys=True)),
+                    ])
@@ -17,13 +17,18 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import os
 import json
+import pickle
+import hashlib
 import argparse
+from functools import wraps
 
 import pandas as pd
-from signac import Collection
 
 from complexity import COMPLEXITY
+from complexity import WRITE_CATEGORIES
+from results import stream_results
 
 
 def strip_complexity(cat):
@@ -42,7 +47,32 @@ def normalize(data, N):
         yield cat, 1e3 * x_mean
 
 
+def normalize_memory(memory, N):
+    for cat, m in memory.items():
+        cplx, cat_ = strip_complexity(cat)
+        for metric, value in m.items():
+            if cplx is not None and value is not None:
+                value /= eval(cplx)
+            yield '{}:{}'.format(cat, metric), value
+
+
+def normalize_io(io, N):
+    "Yields the I/O counters per iteration and per job of each category."
+    for cat, m in io.items():
+        per_job = m.get('per_job')
+        if per_job is None:
+            per_job = {k: v / N for k, v in m.items() if k != 'open_files'}
+        for metric, value in m.items():
+            if metric != 'per_job':
+                yield '{}:{}'.format(cat, metric), value
+        for metric, value in per_job.items():
+            yield '{}:{}/job'.format(cat, metric), value
+
+
 def tr(s):
+    if ':' in s:
+        cat, variant = s.split(':', 1)
+        return '{} ({})'.format(tr(cat), variant)
     cplx, cat = strip_complexity(s)
     t = {
         'select_by_id': "Select by ID",
@@ -51,6 +81,16 @@ def tr(s):
         'iterate_single_pass': "Iterate (single pass)",
         'search_lean_filter': "Search w/ lean filter",
         'search_rich_filter': "Search w/ rich filter",
+        'init_jobs': "Init job",
+        'update_document_single_key': "Update document (single key)",
+        'update_document_bulk': "Update document (bulk)",
+        'reset_statepoint': "Reset state point",
+        'update_statepoint': "Update state point",
+        'remove_job': "Remove job",
+        'iterate_threaded': "Iterate (multiple passes, threaded)",
+        'iterate_single_pass_threaded': "Iterate (single pass, threaded)",
+        'search_lean_filter_threaded': "Search w/ lean filter (threaded)",
+        'search_rich_filter_threaded': "Search w/ rich filter (threaded)",
         'datreant.core': "datreant",
         'tool,N': "Tool, N",
     }.get(cat, cat)
@@ -59,33 +99,271 @@ def tr(s):
     return t
 
 
+def _read_docs(filename, filter, fields=None):
+    filter = dict(filter or {})
+    filter.setdefault('data', {'$exists': True})
+    return stream_results(filename, filter, fields)
+
+
+def _frame(rows, meta):
+    "Returns the data frame of rows, where the meta data columns are not numeric."
+    df = pd.DataFrame.from_dict(rows, orient='index')
+    return df.astype({column: object for column in meta if column in df.columns})
+
+
+def _stamp(filename):
+    stat = os.stat(filename)
+    return [os.path.abspath(filename), stat.st_mtime_ns, stat.st_size]
+
+
+def cached(func):
+    """Cache the data frame returned by func next to the result store.
+
+    The cache is invalidated whenever the result store is modified.
+    """
+    @wraps(func)
+    def wrapper(filename, filter, cache=True):
+        if not (cache and os.path.isfile(filename)):
+            return func(filename, filter)
+        key = json.dumps([func.__name__, func.__code__.co_code.hex(), filter], sort_keys=True)
+        cachedir = os.path.join(os.path.dirname(os.path.abspath(filename)),
+                                '.{}.cache'.format(os.path.basename(filename)))
+        fn_cache = os.path.join(cachedir, hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+        stamp = _stamp(filename)
+        try:
+            with open(fn_cache, 'rb') as file:
+                stamp_cached, df = pickle.load(file)
+            if stamp_cached == stamp:
+                return df
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            pass
+        df = func(filename, filter)
+        os.makedirs(cachedir, exist_ok=True)
+        with open(fn_cache + '~', 'wb') as file:
+            pickle.dump((stamp, df), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fn_cache + '~', fn_cache)
+        return df
+    return wrapper
+
+
+@cached
 def read_benchmark(filename, filter):
-    with Collection.open(filename) as c:
-        docs = list(c.find(filter))
+    rows, meta = dict(), set()
+    for doc in _read_docs(filename, filter, ['meta', 'data', 'cold']):
+        meta.update(doc['meta'])
+        N = doc['meta']['N']
+        row = dict(doc['meta'])
+        row.update(normalize(doc['data'], N))
+        row.update((cat + ':cold', x) for cat, x in normalize(doc.get('cold', {}), N))
+        rows[doc['_id']] = row
+    return _frame(rows, meta)
+
+
+@cached
+def read_truncated(filename, filter):
+    rows = []
+    for doc in _read_docs(filename, filter, ['meta', 'truncated']):
+        for cat, t in doc.get('truncated', {}).items():
+            rows.append({'tool': doc['meta']['tool'], 'N': doc['meta']['N'],
+                         'category': tr(cat), 'lower_bound': t['lower_bound']})
+    return pd.DataFrame(rows, columns=['tool', 'N', 'category', 'lower_bound'])
+
+
+@cached
+def read_samples(filename, filter):
+    """Returns one row per normalized time sample (in ms) and category.
+
+    The full sample set is used for results that were measured adaptively,
+    otherwise every repeat contributes one sample.
+    """
+    rows = []
+    for doc in _read_docs(filename, filter, ['meta', 'data', 'stats']):
+        N = doc['meta']['N']
+        stats = doc.get('stats', {})
+        for cat, x in doc['data'].items():
+            cplx, cat_ = strip_complexity(cat)
+            scale = 1e3 / (1 if cplx is None else eval(cplx))
+            if cat in stats:
+                samples = stats[cat]['samples']
+            else:
+                samples = [y / n for n, y in x]
+            rows.extend({'tool': doc['meta']['tool'], 'N': N, 'category': cat,
+                         'sample': scale * sample} for sample in samples)
+    return pd.DataFrame(rows, columns=['tool', 'N', 'category', 'sample'])
 
-    df_meta = pd.DataFrame(
-        {doc['_id']: doc['meta'] for doc in docs}).T
-    df_data = pd.DataFrame(
-        {doc['_id']: dict(normalize(doc['data'], doc['meta']['N'])) for doc in docs}).T
 
-    return pd.concat([df_meta, df_data], axis=1)
+@cached
+def read_memory(filename, filter):
+    rows, meta = dict(), set()
+    for doc in _read_docs(filename, filter, ['meta', 'memory']):
+        meta.update(doc['meta'])
+        row = dict(doc['meta'])
+        row.update(normalize_memory(doc.get('memory', {}), doc['meta']['N']))
+        rows[doc['_id']] = row
+    return _frame(rows, meta)
+
+
+@cached
+def read_io(filename, filter):
+    rows, meta = dict(), set()
+    for doc in _read_docs(filename, filter, ['meta', 'io']):
+        meta.update(doc['meta'])
+        row = dict(doc['meta'])
+        row.update(normalize_io(doc.get('io', {}), doc['meta']['N']))
+        rows[doc['_id']] = row
+    return _frame(rows, meta)
+
+
+@cached
+def read_queries(filename, filter):
+    rows = []
+    for doc in _read_docs(filename, filter, ['meta', 'queries']):
+        for query in doc.get('queries') or []:
+            if query['data'] is None:
+                continue
+            rows.append({
+                'tool': doc['meta']['tool'],
+                'N': doc['meta']['N'],
+                'operator': query['operator'],
+                'target': query['target'],
+                'selectivity': query['selectivity'],
+                'latency': 1e3 * min(dt / n for n, dt in query['data']),
+            })
+    return pd.DataFrame(rows, columns=['tool', 'N', 'operator', 'target',
+                                       'selectivity', 'latency'])
+
+
+@cached
+def read_startup(filename, filter):
+    rows = []
+    for doc in _read_docs(filename, filter, ['meta', 'startup']):
+        if doc.get('startup'):
+            row = {'tool': doc['meta']['tool'], 'N': doc['meta']['N']}
+            row.update((stage, 1e3 * s['median'])
+                       for stage, s in doc['startup']['stats'].items())
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@cached
+def read_teardown(filename, filter):
+    rows = []
+    for doc in _read_docs(filename, filter, ['meta', 'teardown']):
+        if 'teardown' in doc:
+            rows.append({
+                'tool': doc['meta']['tool'],
+                'N': doc['meta']['N'],
+                'time': doc['teardown']['time'],
+                'files/s': doc['teardown']['files_per_second'],
+                'MB/s': (doc['teardown']['bytes_per_second'] or 0) / 2 ** 20,
+            })
+    return pd.DataFrame(rows, columns=['tool', 'N', 'time', 'files/s', 'MB/s'])
+
+
+def _min_time(data):
+    "Returns the fastest time per iteration in ms or NaN for truncated categories."
+    return float('nan') if data is None else 1e3 * min(dt / n for n, dt in data)
+
+
+@cached
+def read_caching(filename, filter):
+    rows = []
+    for doc in _read_docs(filename, filter, ['meta', 'caching']):
+        if not doc.get('caching'):
+            continue
+        baseline = doc['caching']['baseline']['statepoint_metadata_size']
+        for fmt, data in doc['caching']['formats'].items():
+            rows.append({
+                'N': doc['meta']['N'],
+                'format': fmt,
+                'size': data['size'],
+                'size/metadata': data['size'] / baseline,
+                'load': _min_time(data['load']),
+                'lookup': _min_time(data['lookup']),
+                'update': _min_time(data['update']),
+            })
+    return pd.DataFrame(rows, columns=['N', 'format', 'size', 'size/metadata',
+                                       'load', 'lookup', 'update'])
 
 
 def main(args):
     filter = json.loads(args.filter) if args.filter else None
-    df = read_benchmark(args.filename, filter)
+    df = read_benchmark(args.filename, filter, cache=args.cache)
     print("All values in ms.")
-    print(df.rename(columns=tr).groupby(['tool', 'N']).mean().round(2).T)
+    df_mean = df.groupby(['tool', 'N']).mean(numeric_only=True)
+    print(df_mean.rename(columns=tr).round(2).T)
+    if 'raw' in df_mean.index.get_level_values('tool'):
+        df_raw = df_mean.xs('raw', level='tool')
+        df_ratio = df_mean.drop('raw', level='tool').div(df_raw, level='N')
+        print("Times relative to the raw filesystem baseline (x slower than raw).")
+        print(df_ratio.dropna(axis=1, how='all').rename(columns=tr).round(1).T)
+    df_truncated = read_truncated(args.filename, filter, cache=args.cache)
+    if len(df_truncated):
+        print("Truncated by the category budget (lower bounds are marked):")
+        print(df_truncated.to_string(index=False))
+    writes = [cat for cat in WRITE_CATEGORIES if cat in df.columns]
+    if writes:
+        df_throughput = 1e3 / df[['tool', 'N'] + writes].set_index(['tool', 'N']).astype(float)
+        print("Write throughput in operations per second.")
+        df_throughput = df_throughput.rename(columns=tr).groupby(['tool', 'N']).mean()
+        print(df_throughput.round(0).T.dropna(axis=1, how='all'))
+    if args.memory:
+        df = read_memory(args.filename, filter, cache=args.cache)
+        print("All values in bytes (per job for O(N) categories).")
+        print(df.rename(columns=tr).groupby(['tool', 'N']).mean(numeric_only=True).round(0).T)
+    if args.io:
+        df = read_io(args.filename, filter, cache=args.cache)
+        print("I/O counters and context switches per iteration and per job.")
+        print(df.rename(columns=tr).groupby(['tool', 'N']).mean(numeric_only=True).round(2).T)
+    if args.queries:
+        df = read_queries(args.filename, filter, cache=args.cache)
+        print("Query latency in ms by target selectivity.")
+        print(df.pivot_table(index=['tool', 'operator'], columns=['N', 'target'],
+                             values='latency').round(3).T)
+    if args.startup:
+        df = read_startup(args.filename, filter, cache=args.cache)
+        if len(df):
+            print("Median startup time in fresh interpreters in ms.")
+            print(df.groupby(['tool', 'N']).mean().round(2).T)
+    if args.teardown:
+        df = read_teardown(args.filename, filter, cache=args.cache)
+        print("Workspace deletion time in s and throughput.")
+        print(df.groupby(['tool', 'N']).mean().round(2))
+    if args.caching:
+        df = read_caching(args.filename, filter, cache=args.cache)
+        print("State point cache formats (sizes in bytes, times in ms).")
+        print(df.groupby(['N', 'format']).mean().round(3))
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        'filename', default='benchmark.txt', nargs='?',
-        help="The collection that contains the benchmark data.")
+        'filename', default='benchmark.db', nargs='?',
+        help="The result store that contains the benchmark data.")
     parser.add_argument(
         '-f', '--filter', type=str,
         help="Select a subset of the data.")
+    parser.add_argument(
+        '-m', '--memory', action='store_true',
+        help="Also report the memory usage of each category.")
+    parser.add_argument(
+        '-i', '--io', action='store_true',
+        help="Also report the I/O counters of each category.")
+    parser.add_argument(
+        '-Q', '--queries', action='store_true',
+        help="Also report the query latency against selectivity.")
+    parser.add_argument(
+        '-S', '--startup', action='store_true',
+        help="Also report the startup time in fresh interpreters.")
+    parser.add_argument(
+        '-T', '--teardown', action='store_true',
+        help="Also report the workspace deletion throughput.")
+    parser.add_argument(
+        '-C', '--caching', action='store_true',
+        help="Also report the state point cache format benchmark.")
+    parser.add_argument(
+        '--no-cache', dest='cache', action='store_false',
+        help="Do not use or update the cache of loaded results.")
     args = parser.parse_args()
 
     main(args)
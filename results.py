@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import re
+import json
+import fcntl
+import sqlite3
+import hashlib
+import argparse
+from contextlib import contextmanager
+
+from signac import Collection
+
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# Matches the base64 encoded profile of a result to skip it during parsing.
+PROFILE = re.compile(r'"profile":\s*"[A-Za-z0-9+/=]{64,}"')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    meta_hash TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    profile TEXT,
+    superseded INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS results_meta_hash ON results (meta_hash, superseded);
+"""
+
+
+def meta_hash(meta):
+    "Returns the canonical hash of a result's meta data."
+    return hashlib.sha1(json.dumps(meta, sort_keys=True).encode()).hexdigest()
+
+
+def _split_exists(filter):
+    """Split the top-level $exists clauses from filter.
+
+    The clauses are evaluated directly, since signac can not build an index
+    for sections that contain lists, e.g., the queries.
+    """
+    exists, rest = dict(), dict()
+    for key, value in filter.items():
+        if isinstance(value, dict) and list(value) == ['$exists']:
+            exists[key] = value['$exists']
+        else:
+            rest[key] = value
+    return exists, rest
+
+
+def _exists(doc, exists):
+    return all((key in doc) == bool(flag) for key, flag in exists.items())
+
+
+def _matches(doc, filter):
+    exists, filter = _split_exists(filter)
+    return _exists(doc, exists) and len(Collection([doc]).find(filter)) == 1
+
+
+class ResultStore(object):
+    """An append-only SQLite result store.
+
+    Results are indexed by the hash of their meta data. Replacing a result
+    appends the new result and marks the previous one as superseded. The
+    profile of each result is stored separately and only loaded on request.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._conn = sqlite3.connect(filename, timeout=600)
+        self._conn.executescript(SCHEMA)
+
+    def __repr__(self):
+        return "{}(filename={!r})".format(type(self).__name__, self.filename)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, tb):
+        self.close()
+
+    @staticmethod
+    def _load(row):
+        _id, doc, profile = row
+        doc = json.loads(doc)
+        doc['_id'] = str(_id)
+        if profile is not None:
+            doc['profile'] = profile
+        return doc
+
+    def _candidates(self, key):
+        return self._conn.execute(
+            "SELECT id, doc, profile FROM results WHERE meta_hash=? AND superseded=0 "
+            "ORDER BY id DESC", (meta_hash(key['meta']),))
+
+    def find_one(self, key):
+        "Returns the most recent result that matches key or None."
+        for row in self._candidates(key):
+            doc = self._load(row)
+            if _matches(doc, key):
+                return doc
+        return None
+
+    def _insert(self, doc):
+        doc = dict(doc)
+        doc.pop('_id', None)
+        profile = doc.pop('profile', None)
+        self._conn.execute(
+            "INSERT INTO results (meta_hash, doc, profile) VALUES (?, ?, ?)",
+            (meta_hash(doc['meta']), json.dumps(doc), profile))
+
+    def insert(self, doc):
+        with self._conn:
+            self._insert(doc)
+
+    def replace_one(self, key, doc):
+        "Append doc and supersede all previous results that match key."
+        with self._conn:
+            # Lock the database before reading, such that concurrent writers
+            # can neither observe nor supersede a partial replacement.
+            self._conn.execute("BEGIN IMMEDIATE")
+            replaced = [row[0] for row in self._candidates(key)
+                        if _matches(self._load(row), key)]
+            self._conn.executemany(
+                "UPDATE results SET superseded=1 WHERE id=?", [(_id,) for _id in replaced])
+            self._insert(doc)
+
+    def find(self, filter=None, profile=False):
+        "Yields all current results that match filter."
+        columns = 'id, doc, profile' if profile else 'id, doc, NULL'
+        docs = (self._load(row) for row in self._conn.execute(
+            "SELECT {} FROM results WHERE superseded=0 ORDER BY id".format(columns)))
+        if filter:
+            for doc in Collection(docs).find(filter):
+                yield doc
+        else:
+            for doc in docs:
+                yield doc
+
+
+class CollectionStore(object):
+    "Provides the result store interface for signac collection files."
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def _find(self, key):
+        exists, key = _split_exists(key)
+        for doc in self._collection.find(key):
+            if _exists(doc, exists):
+                yield doc
+
+    def find_one(self, key):
+        for doc in self._find(key):
+            return doc
+        return None
+
+    def insert(self, doc):
+        self._collection.insert_one(doc)
+
+    def replace_one(self, key, doc):
+        for old in self._find(key):
+            self._collection.replace_one({'_id': old['_id']}, doc)
+            return
+        self._collection.insert_one(doc)
+
+    def find(self, filter=None, profile=False):
+        for doc in self._collection.find(filter):
+            if not profile:
+                doc.pop('profile', None)
+            yield doc
+
+
+@contextmanager
+def open_results(filename):
+    """Open the result store at filename.
+
+    Files with a SQLite extension are opened as ResultStore, all other files
+    as signac collection, while holding an exclusive lock on them.
+    """
+    if filename.endswith(SQLITE_EXTENSIONS):
+        with ResultStore(filename) as store:
+            yield store
+    else:
+        with open(filename + '.lock', 'w') as lockfile:
+            fcntl.flock(lockfile.fileno(), fcntl.LOCK_EX)
+            try:
+                with Collection.open(filename) as c:
+                    yield CollectionStore(c)
+            finally:
+                fcntl.flock(lockfile.fileno(), fcntl.LOCK_UN)
+
+
+def _filter_fields(filter):
+    "Yields the top-level fields that are referenced by filter."
+    for key, value in filter.items():
+        if key in ('$and', '$or'):
+            for f in value:
+                for field in _filter_fields(f):
+                    yield field
+        elif key == '$not':
+            for field in _filter_fields(value):
+                yield field
+        elif not key.startswith('$'):
+            yield key.split('.')[0]
+
+
+def _prune(doc, fields):
+    if fields is None:
+        doc.pop('profile', None)
+        return doc
+    return {k: doc[k] for k in fields if k in doc}
+
+
+def _read_store(filename):
+    with ResultStore(filename) as store:
+        for doc in store.find():
+            yield doc
+
+
+def _read_lines(filename):
+    with open(filename + '.lock', 'a') as lockfile:
+        fcntl.flock(lockfile.fileno(), fcntl.LOCK_SH)
+        try:
+            with open(filename) as file:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(PROFILE.sub('"profile": null', line))
+        finally:
+            fcntl.flock(lockfile.fileno(), fcntl.LOCK_UN)
+
+
+def stream_results(filename, filter=None, fields=None):
+    """Yields all results in filename that match filter without their profile.
+
+    Collection files are parsed line by line. Only the '_id' and the given
+    top-level fields of each result are kept if fields is provided.
+    """
+    if fields is not None:
+        fields = ['_id'] + list(fields)
+    if filename.endswith(SQLITE_EXTENSIONS):
+        docs = _read_store(filename)
+    else:
+        docs = _read_lines(filename)
+    if filter:
+        keep = None if fields is None else fields + list(_filter_fields(filter))
+        docs = Collection(_prune(doc, keep) for doc in docs).find(filter)
+    for doc in docs:
+        yield _prune(doc, fields)
+
+
+def migrate(src, dst):
+    "Copy all results from the result store src to dst."
+    n = 0
+    with open_results(src) as source, open_results(dst) as target:
+        for doc in source.find(profile=True):
+            doc.pop('_id', None)
+            target.insert(doc)
+            n += 1
+    return n
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Migrate benchmark results between result stores, "
+                    "e.g., from a collection file to a SQLite database.")
+    parser.add_argument(
+        'src', help="The result store to read from.")
+    parser.add_argument(
+        'dst', help="The result store to write to.")
+    args = parser.parse_args()
+
+    print("Migrated {} results.".format(migrate(args.src, args.dst)))
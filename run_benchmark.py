@@ -18,6 +18,7 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import os
 import sys
 import logging
 import random
@@ -25,16 +26,53 @@ import argparse
 import platform
 import base64
 import json
+from copy import copy
+from collections import OrderedDict
+from functools import partial
 from pprint import pprint
 from cProfile import Profile
 from contextlib import contextmanager
 from tempfile import NamedTemporaryFile
 from tempfile import gettempdir
 
-from signac import Collection
-
+from complexity import COMPLEXITY
 from util import fmt_size
+from util import parse_size
 from util import get_partition
+from util import dataspace_hash
+from fixtures import FixtureCache
+from teardown import Reaper
+from journal import Journal
+from journal import finish
+from results import open_results
+from fixtures import writable_clone
+from scaling import sweep_range
+from scaling import fit_scaling
+from measure import measure_time
+from measure import measure_cold
+from measure import measure_adaptive
+from measure import measure_memory
+from measure import measure_io
+from measure import measure_budget
+from measure import call_budget
+from pagecache import verify_eviction
+from calibration import calibrate_host
+from sampler import measure_sampled
+from benchmark_contention import DEFAULT_MIX
+from queries import SELECTIVITIES
+from schemas import SCHEMAS
+from schemas import load_schema
+from benchmark_contention import benchmark_contention
+
+
+logger = logging.getLogger(__name__)
+
+COLD_CATEGORIES = [
+    'determine_len',
+    'iterate_single_pass',
+    'search_lean_filter',
+    'search_rich_filter',
+]
 
 
 def expected_size(args):
@@ -43,7 +81,7 @@ def expected_size(args):
 
 def default_doc(args):
     tmpdir = gettempdir() if args.root is None else args.root
-    return {'meta': {
+    doc = {'meta': {
         'tool': args.tool,
         'N': args.N,
         'num_keys': args.num_keys,
@@ -55,6 +93,9 @@ def default_doc(args):
         'platform': platform.uname()._asdict(),
         'fstype': get_partition(tmpdir).fstype,
     }}
+    if args.schema:
+        doc['meta']['schema'] = load_schema(args.schema)
+    return doc
 
 
 @contextmanager
@@ -70,11 +111,143 @@ def run_with_profile():
         profile.stats = base64.b64encode(statsfile.read()).decode()
 
 
+def budgeted(args, doc, measure=measure_time, variant=None):
+    "Returns measure bounded by the category budget if one is set."
+    if args.category_budget:
+        return measure_budget(doc['truncated'], args.category_budget, measure, variant)
+    return measure
+
+
+def call_budgeted(args, doc, key, func, *args_, **kwargs):
+    "Returns func(*args_, **kwargs) or None if it exceeds the category budget."
+    if args.category_budget:
+        return call_budget(doc['truncated'], key, args.category_budget, func, *args_, **kwargs)
+    return func(*args_, **kwargs)
+
+
+def run_categories(args, doc, benchmark, root, journal):
+    wait_teardown()
+    doc['calibration'] = journal.call('calibration', calibrate_host)
+    measure = measure_time
+    if args.adaptive:
+        doc['stats'] = OrderedDict()
+        measure = measure_adaptive(
+            doc['stats'], target_time=args.target_time,
+            ci_width=args.ci_width, budget=args.time_budget)
+    if args.category_budget:
+        doc['truncated'] = OrderedDict()
+    measure = budgeted(args, doc, measure)
+    if args.sample:
+        doc['samples'] = OrderedDict()
+        measure = measure_sampled(
+            doc['samples'], measure, interval=1.0 / args.sample, mode=args.sample_mode)
+    if args.io:
+        doc['io'] = OrderedDict()
+        measure = measure_io(doc['io'], measure, N=doc['meta']['N'])
+    journal.track(doc, [name for name in ('stats', 'truncated', 'samples', 'io') if name in doc])
+    measure = journal.measure('data', measure)
+
+    if args.profile:
+        with run_with_profile() as profile:
+            doc['data'] = benchmark(args.categories, measure=measure)
+        doc['profile'] = profile.stats
+    else:
+        doc['data'] = benchmark(args.categories, measure=measure)
+
+    if args.memory:
+        doc['memory'] = benchmark(args.categories, measure=journal.measure(
+            'memory', budgeted(args, doc, measure_memory, 'memory')))
+
+    if args.cold:
+        keys = [cat for cat in COLD_CATEGORIES
+                if args.categories is None or cat in args.categories]
+        doc['cold'] = benchmark(keys, measure=journal.measure(
+            'cold', budgeted(args, doc, measure_cold(root), 'cold')))
+        doc.setdefault('fixture', {})['eviction'] = journal.call(
+            'eviction', verify_eviction, root)
+
+
+def journal_filename(args):
+    if args.journal is None and args.output != '-':
+        return args.output + '.journal'
+    return args.journal
+
+
+def open_journal(args, key):
+    "Returns the journal of the configuration identified by key."
+    return Journal(journal_filename(args), key, resume=args.resume)
+
+
+def store_journaled(args, store_result, journal, key, doc):
+    store_result(key, doc)
+    if not args.defer_journal:
+        journal.done()
+
+
+def finish_journal(args, key):
+    "Remove the journal entries of the stored configuration identified by key."
+    finish(journal_filename(args), key)
+
+
+def fixture_cache(args):
+    if args.fixture_cache:
+        return FixtureCache(args.fixture_cache, parse_size(args.fixture_cache_size))
+
+
+_reaper = None
+
+
+def workspace_reaper(args):
+    "Returns the reaper that deletes the workspaces in the background or None."
+    global _reaper
+    if _reaper is None and args.teardown_workers:
+        _reaper = Reaper(args.teardown_workers, parse_size(args.teardown_pending))
+    return _reaper
+
+
+def wait_teardown():
+    """Wait until all workspaces are deleted and their results are stored.
+
+    Called before timing each configuration, such that the deletion of the
+    previous workspace does not interfere with the measurements.
+    """
+    if _reaper is not None:
+        _reaper.wait()
+
+
+def _store_teardown(store_result, key, doc, future):
+    try:
+        doc['teardown'] = future.result()
+    except Exception as error:
+        logger.error("Failed to delete workspace: {}".format(error))
+    store_result(key, doc)
+
+
+def store_teardown(store_result, key, doc, reaper, root):
+    """Store doc immediately or, if the workspace at root is deleted by reaper,
+    together with the teardown metric once the deletion has completed."""
+    if reaper is None:
+        store_result(key, doc)
+    else:
+        reaper.then(root, partial(_store_teardown, store_result, key, doc))
+
+
+def run_contention(args, root):
+    import signac
+    with writable_clone(root, dir=os.path.dirname(root)) as tmp:
+        return benchmark_contention(
+            signac.get_project(root=tmp), args.contention_mix,
+            args.contention_duration, args.contention_workers)
+
+
 def benchmark_signac(args, check_skip, store_result):
     import signac
     from benchmark_signac import setup_random_project
     from benchmark_signac import determine_project_size
     from benchmark_signac import benchmark_project
+    from benchmark_signac import benchmark_queries
+    from benchmark_caching import benchmark_caching
+    from benchmark_startup import benchmark_startup
 
     doc = default_doc(args)
     doc['meta']['versions'] = {
@@ -82,24 +255,52 @@ def benchmark_signac(args, check_skip, store_result):
         'signac': signac.__version__}
     key = doc.copy()
     key['profile'] = {'$exists': args.profile}
-
-    if check_skip(key):
-        return
-
+    key['cold'] = {'$exists': args.cold}
+    key['memory'] = {'$exists': args.memory}
+    key['stats'] = {'$exists': args.adaptive}
+    key['samples'] = {'$exists': bool(args.sample)}
+    key['io'] = {'$exists': args.io}
+    key['queries'] = {'$exists': args.queries}
+    key['contention'] = {'$exists': args.contention}
+    key['caching'] = {'$exists': args.caching}
+    key['startup'] = {'$exists': args.startup}
+
+    skip = check_skip(key)
+    if skip:
+        return skip
+    journal = open_journal(args, key)
+
+    cache = fixture_cache(args)
+    reaper = workspace_reaper(args)
     with setup_random_project(args.N, args.num_keys, args.num_doc_keys,
                               data_size=args.data_size, data_std=args.data_std,
-                              seed=args.seed, root=args.root) as project:
+                              seed=args.seed, root=args.root, cache=cache,
+                              schema=doc['meta'].get('schema'), reaper=reaper) as project:
+        if cache is not None:
+            doc['fixture'] = cache.info
+        root = project.root_directory()
         if args.cached:
             project.update_cache()
-        doc['size'] = determine_project_size(project)
-        if args.profile:
-            with run_with_profile() as profile:
-                doc['data'] = benchmark_project(project, args.categories)
-            doc['profile'] = profile.stats
-        else:
-            doc['data'] = benchmark_project(project, args.categories)
-
-    store_result(key, doc)
+        journal.check('dataspace', dataspace_hash(project.workspace()))
+        doc['size'] = journal.call('size', determine_project_size, project)
+        run_categories(args, doc, partial(benchmark_project, project), root, journal)
+        if args.queries:
+            doc['queries'] = journal.call(
+                'queries', benchmark_queries, project, args.query_selectivities,
+                seed=args.seed, measure=budgeted(args, doc))
+        if args.caching:
+            doc['caching'] = journal.call(
+                'caching', benchmark_caching, project, args.caching_update,
+                measure=budgeted(args, doc))
+        if args.startup:
+            doc['startup'] = journal.call(
+                'startup', call_budgeted, args, doc, 'startup',
+                benchmark_startup, project, args.startup_repeat)
+        if args.contention:
+            doc['contention'] = journal.call('contention', run_contention, args, root)
+
+    store_teardown(partial(store_journaled, args, store_result, journal), key, doc, reaper, root)
+    return doc
 
 
 def benchmark_datreant_core(args, check_skip, store_result):
@@ -107,6 +308,7 @@ def benchmark_datreant_core(args, check_skip, store_result):
     from benchmark_datreant import setup_random_bundle
     from benchmark_datreant import determine_bundle_size
     from benchmark_datreant import benchmark_bundle
+    from benchmark_datreant import benchmark_queries
 
     doc = default_doc(args)
     doc['meta']['versions'] = {
@@ -114,29 +316,147 @@ def benchmark_datreant_core(args, check_skip, store_result):
         'datreant': dtr.__version__}
     key = doc.copy()
     key['profile'] = {'$exists': args.profile}
-
-    if check_skip(key):
-        return
-
+    key['cold'] = {'$exists': args.cold}
+    key['memory'] = {'$exists': args.memory}
+    key['stats'] = {'$exists': args.adaptive}
+    key['samples'] = {'$exists': bool(args.sample)}
+    key['io'] = {'$exists': args.io}
+    key['queries'] = {'$exists': args.queries}
+
+    skip = check_skip(key)
+    if skip:
+        return skip
+    journal = open_journal(args, key)
+
+    cache = fixture_cache(args)
+    reaper = workspace_reaper(args)
     with setup_random_bundle(
             args.N, args.num_keys, args.num_doc_keys,
             data_size=args.data_size, data_std=args.data_std,
-            seed=args.seed, root=args.root) as bundle:
+            seed=args.seed, root=args.root, cache=cache,
+            schema=doc['meta'].get('schema'), reaper=reaper) as bundle:
         assert not args.cached
-        doc['size'] = determine_bundle_size(bundle)
+        if cache is not None:
+            doc['fixture'] = cache.info
+        journal.check('dataspace', dataspace_hash(os.path.join(bundle, 'workspace')))
+        doc['size'] = journal.call('size', determine_bundle_size, bundle)
+        # Without a budget, the rich filter search takes prohibitively long for large N.
+        skip_rich_filter = args.N > 1000 and not args.category_budget
+        run_categories(args, doc, partial(
+            benchmark_bundle, bundle, skip_rich_filter=skip_rich_filter), bundle, journal)
+        if args.queries:
+            doc['queries'] = journal.call(
+                'queries', benchmark_queries, bundle, args.query_selectivities,
+                seed=args.seed, measure=budgeted(args, doc))
+
+    store_teardown(partial(store_journaled, args, store_result, journal), key, doc, reaper, bundle)
+    return doc
+
+
+def benchmark_raw(args, check_skip, store_result):
+    from benchmark_signac import setup_random_project
+    from benchmark_signac import determine_project_size
+    from benchmark_raw import benchmark_workspace
 
-        skip_rich_filter = args.N > 1000
+    doc = default_doc(args)
+    doc['meta']['versions'] = {
+        'python': '.'.join(map(str, sys.version_info))}
+    key = doc.copy()
+    key['profile'] = {'$exists': args.profile}
+    key['cold'] = {'$exists': args.cold}
+    key['memory'] = {'$exists': args.memory}
+    key['stats'] = {'$exists': args.adaptive}
+    key['samples'] = {'$exists': bool(args.sample)}
+    key['io'] = {'$exists': args.io}
+
+    skip = check_skip(key)
+    if skip:
+        return skip
+    journal = open_journal(args, key)
+
+    cache = fixture_cache(args)
+    reaper = workspace_reaper(args)
+    with setup_random_project(args.N, args.num_keys, args.num_doc_keys,
+                              data_size=args.data_size, data_std=args.data_std,
+                              seed=args.seed, root=args.root, cache=cache,
+                              schema=doc['meta'].get('schema'), reaper=reaper) as project:
+        if cache is not None:
+            doc['fixture'] = cache.info
+        journal.check('dataspace', dataspace_hash(project.workspace()))
+        doc['size'] = journal.call('size', determine_project_size, project)
+        root = project.root_directory()
+        run_categories(args, doc, partial(benchmark_workspace, root), root, journal)
+
+    store_teardown(partial(store_journaled, args, store_result, journal), key, doc, reaper, root)
+    return doc
 
-        if args.profile:
-            with run_with_profile() as profile:
-                doc['data'] = benchmark_bundle(
-                    bundle, args.categories, skip_rich_filter=skip_rich_filter)
-            doc['profile'] = profile.stats
-        else:
-            doc['data'] = benchmark_bundle(
-                bundle, args.categories, skip_rich_filter=skip_rich_filter)
 
+SIGNAC_ONLY = ['contention', 'caching', 'startup']
+
+
+def run(args, check_skip, store_result):
+    if args.tool != 'signac':
+        for option in SIGNAC_ONLY:
+            if getattr(args, option):
+                raise ValueError("The --{} benchmark is only available for signac.".format(option))
+    if args.tool == 'raw' and args.queries:
+        raise ValueError("The --queries benchmark is not available for the raw baseline.")
+    if args.tool == 'signac':
+        return benchmark_signac(args, check_skip, store_result)
+    elif args.tool == 'datreant':
+        return benchmark_datreant_core(args, check_skip, store_result)
+    elif args.tool == 'raw':
+        return benchmark_raw(args, check_skip, store_result)
+    else:
+        raise ValueError("Unknown tool '{}'.".format(args.tool))
+
+
+def sweep(args, check_skip, store_result):
+    docs = []
+    for N in sweep_range(*args.sweep, num=args.sweep_points):
+        args_ = copy(args)
+        args_.N = N
+        docs.append(run(args_, check_skip, store_result))
+
+    doc = default_doc(args)
+    del doc['meta']['N']
+    doc['meta']['sweep'] = [d['meta']['N'] for d in docs]
+    doc['meta']['versions'] = docs[-1]['meta']['versions']
+    key = doc.copy()
+    key['scaling'] = {'$exists': True}
+    doc['scaling'] = fit_scaling(docs, tolerance=args.sweep_tolerance)
+
+    print("Scaling exponents (N={}):".format(doc['meta']['sweep']))
+    for cat, fit in doc['scaling'].items():
+        ci = '' if fit['ci'] is None else ' [{:.2f}, {:.2f}]'.format(*fit['ci'])
+        print("{:>24}: {:.2f}{}".format(cat, fit['exponent'], ci))
+        if fit.get('flagged'):
+            logger.warning("Category '{}' scales with exponent {:.2f}, but declared "
+                           "complexity is O({}).".format(cat, fit['exponent'],
+                                                         COMPLEXITY[cat]))
     store_result(key, doc)
+    return doc
+
+
+def check_skip(args, key):
+    if not (args.overwrite or args.output == '-'):
+        with open_results(args.output) as results:
+            doc = results.find_one(key)
+            if doc is not None:
+                print("Already ran.")
+                return doc
+    return None
+
+
+def store_result(args, key, doc):
+    if args.output == '-':
+        if args.json:
+            print(json.dumps(doc, indent=2))
+        else:
+            pprint(doc)
+    else:
+        with open_results(args.output) as results:
+            results.replace_one(key, doc)
 
 
 def main(args):
@@ -146,46 +466,43 @@ def main(args):
         print("Expected size:", fmt_size(int(expected_size(args))))
         return
 
-    def check_skip(key):
-        if not (args.overwrite or args.output == '-'):
-            with Collection.open(args.output) as c:
-                if len(c.find(key)) >= 1:
-                    print("Already ran.")
-                    return True
-        return False
-
-    def store_result(key, doc):
-        if args.output == '-':
-            if args.json:
-                print(json.dumps(doc, indent=2))
-            else:
-                pprint(doc)
+    try:
+        if args.sweep:
+            sweep(args, partial(check_skip, args), partial(store_result, args))
         else:
-            with Collection.open(args.output) as c:
-                c.replace_one(key, doc, upsert=True)
+            run(args, partial(check_skip, args), partial(store_result, args))
+    finally:
+        wait_teardown()
 
-    if args.tool == 'signac':
-        benchmark_signac(args, check_skip, store_result)
-    elif args.tool == 'datreant':
-        benchmark_datreant_core(args, check_skip, store_result)
-    else:
-        raise ValueError("Unknown tool '{}'.".format(args.tool))
 
-
-if __name__ == '__main__':
+def make_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        'tool', choices=['signac', 'datreant'], nargs='?', default='signac',
-        help="Specify which data management tool to benchmark.")
+        'tool', choices=['signac', 'datreant', 'raw'], nargs='?', default='signac',
+        help="Specify which data management tool to benchmark. The 'raw' tool is "
+             "the baseline of plain filesystem operations on the signac data space.")
     parser.add_argument(
-        '-o', '--output', nargs='?', default='benchmark.txt',
-        help="Specify which collection file to store results to or '-' for None.")
+        '-o', '--output', nargs='?', default='benchmark.db',
+        help="Specify which result store to store results to or '-' for None. "
+             "Files with a '.db' extension are stored as SQLite database, "
+             "all other files as collection file.")
     parser.add_argument(
         '--json', action='store_true',
         help="Use JSON formatting if the --output argument is '-'.")
     parser.add_argument(
         '-N', type=int, default=100,
         help="The number of data/ state points within the benchmarked project.")
+    parser.add_argument(
+        '--sweep', type=int, nargs=2, metavar=('N_MIN', 'N_MAX'),
+        help="Run all categories over a geometric range of N and fit the scaling "
+             "exponent of each category.")
+    parser.add_argument(
+        '--sweep-points', type=int, default=5,
+        help="The number of data space sizes within the sweep range.")
+    parser.add_argument(
+        '--sweep-tolerance', type=float, default=0.1,
+        help="Flag categories whose measured scaling exponent exceeds the declared "
+             "complexity by more than this value.")
     parser.add_argument(
         '-k', '--num-keys', type=int, default=10,
         help="The numnber of primary metadata keys.")
@@ -198,18 +515,106 @@ if __name__ == '__main__':
     parser.add_argument(
         '--data-std', type=float, default=0,
         help="The standard deviation of the data size.")
+    parser.add_argument(
+        '--schema', type=str,
+        help="Generate the metadata from a schema instead of random strings. Choose "
+             "from the built-in schemas ({}) or provide a JSON file.".format(
+                 ', '.join(sorted(SCHEMAS))))
     parser.add_argument(
         '-r', '--seed', type=int, default=0,
         help="The random seed to use.")
     parser.add_argument(
         '--cached', action='store_true',
         help="Use caching option if applicable.")
+    parser.add_argument(
+        '-a', '--adaptive', action='store_true',
+        help="Calibrate the number of loops and repeat each category until the "
+             "confidence interval of the median is narrow enough.")
+    parser.add_argument(
+        '--target-time', type=float, default=0.2,
+        help="The target duration of one repeat in seconds (adaptive mode).")
+    parser.add_argument(
+        '--ci-width', type=float, default=0.05,
+        help="The target relative width of the confidence interval (adaptive mode).")
+    parser.add_argument(
+        '--time-budget', type=float, default=30,
+        help="The maximum time spent on repeats per category in seconds (adaptive mode).")
+    parser.add_argument(
+        '--category-budget', type=float, metavar='SECONDS',
+        help="Interrupt each category of every pass, each query, each cache format "
+             "operation and the startup benchmark after the given wall-clock time. "
+             "Interrupted categories keep their completed repeats or record a lower "
+             "bound and are marked as truncated. Without a budget, datreant's rich "
+             "filter search is skipped for N > 1000.")
+    parser.add_argument(
+        '--memory', action='store_true',
+        help="Measure the memory usage of each category in a separate pass.")
+    parser.add_argument(
+        '--no-io', dest='io', action='store_false',
+        help="Do not record the I/O counters and context switches of each category.")
+    parser.add_argument(
+        '--cold', action='store_true',
+        help="Additionally time selected categories with the workspace evicted "
+             "from the page cache before each pass.")
+    parser.add_argument(
+        '--queries', action='store_true',
+        help="Time queries of each operator class with controlled selectivity.")
+    parser.add_argument(
+        '--query-selectivities', type=float, nargs='+', default=SELECTIVITIES,
+        help="The target fractions of the data space matched by the queries.")
+    parser.add_argument(
+        '--caching', action='store_true',
+        help="Benchmark the size, load, lookup and update times of the state point "
+             "cache in different serialization formats (signac only).")
+    parser.add_argument(
+        '--caching-update', type=int, default=100, metavar='M',
+        help="The number of state points added to benchmark cache updates.")
+    parser.add_argument(
+        '--startup', action='store_true',
+        help="Time the import of signac, getting the project and opening the first "
+             "job in fresh interpreters (signac only).")
+    parser.add_argument(
+        '--startup-repeat', type=int, default=10,
+        help="The number of fresh interpreters per startup stage.")
+    parser.add_argument(
+        '--contention', action='store_true',
+        help="Run the concurrent multi-process contention benchmark (signac only).")
+    parser.add_argument(
+        '--contention-mix', type=str, default=DEFAULT_MIX,
+        help="The weighted mix of 'iterate', 'find', 'open' and 'write' operations.")
+    parser.add_argument(
+        '--contention-duration', type=float, default=5,
+        help="The duration of the contention benchmark per number of workers in seconds.")
+    parser.add_argument(
+        '--contention-workers', type=int, nargs='+',
+        help="The numbers of concurrent workers. Defaults to powers of two up to "
+             "the number of available CPUs.")
     parser.add_argument(
         '-p', '--profile', action='store_true',
-        help="Activate profiling (Results should not be used for reporting.")
+        help="Activate deterministic profiling (Results should not be used for reporting).")
+    parser.add_argument(
+        '--sample', type=float, metavar='RATE',
+        help="Sample the stack of each category at the given rate in Hz. The "
+             "sampled stacks and the sampling overhead are stored with the results.")
+    parser.add_argument(
+        '--sample-mode', choices=['signal', 'thread'], default='signal',
+        help="Sample on a CPU time interval timer or from a separate thread "
+             "on wall-clock time.")
     parser.add_argument(
         '--overwrite', action='store_true',
         help="Overwrite existing result.")
+    parser.add_argument(
+        '--resume', action='store_true',
+        help="Resume an interrupted run, completed categories are restored from the "
+             "journal unless the data space differs. Deterministic profiles only cover "
+             "the remaining categories.")
+    parser.add_argument(
+        '--journal', type=str,
+        help="The journal that every completed category is appended to. Defaults to "
+             "the output file with a '.journal' suffix, no journal is kept for '-'.")
+    parser.add_argument(
+        '--defer-journal', action='store_true',
+        help=argparse.SUPPRESS)
     parser.add_argument(
         '-n', '--dry-run', action='store_true',
         help="Perform a dry run, do not actually benchmark.")
@@ -217,13 +622,32 @@ if __name__ == '__main__':
         '--root', type=str,
         help="Specify the root directory for all temporary directories. "
              "Defaults to the system default temp directory.")
+    parser.add_argument(
+        '--fixture-cache', type=str,
+        help="Specify a directory to cache generated fixtures in. "
+             "Benchmarks are executed on clones of the cached fixtures.")
+    parser.add_argument(
+        '--fixture-cache-size', type=str, default='10GB',
+        help="The maximum size of the fixture cache, e.g., '10GB'.")
+    parser.add_argument(
+        '--teardown-workers', type=int, default=4,
+        help="The number of threads that delete the workspaces in the background "
+             "while the next configuration runs. The deletion throughput is stored "
+             "with the results. Use 0 to delete the workspaces synchronously.")
+    parser.add_argument(
+        '--teardown-pending', type=str, default='1GB',
+        help="The maximum size of the workspaces pending deletion, e.g., '1GB'.")
     parser.add_argument(
         '-c', '--categories', nargs='+',
         help="Limit benchmark to given categories.")
     parser.add_argument(
         '--debug', action='store_true',
         help="Activate debug logging output.")
-    args = parser.parse_args()
+    return parser
+
+
+if __name__ == '__main__':
+    args = make_parser().parse_args()
 
     if args.debug:
         logging.basicConfig(level=logging.DEBUG)
@@ -0,0 +1,132 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import sys
+import signal
+import threading
+from time import perf_counter
+from collections import Counter
+
+
+MAX_DEPTH = 128
+
+
+def label(func):
+    "Returns a label for a function, which is independent of the installation path."
+    filename, lineno, name = func
+    if 'site-packages' + os.sep in filename:
+        filename = filename.split('site-packages' + os.sep)[-1]
+    elif filename != '~':
+        filename = os.path.basename(filename)
+    return '{}:{}({})'.format(filename, lineno, name)
+
+
+class Sampler(object):
+    """Statistical profiler, which samples the main thread's stack at a fixed interval.
+
+    In 'signal' mode, the stack is sampled from a SIGPROF handler triggered by
+    an interval timer on the process CPU time, in 'thread' mode from a
+    separate thread on wall-clock time. The time spent on sampling is
+    accumulated to determine the profiler's overhead.
+    """
+
+    def __init__(self, interval=0.001, mode='signal'):
+        if mode not in ('signal', 'thread'):
+            raise ValueError("Unknown sampling mode '{}'.".format(mode))
+        if mode == 'signal' and not hasattr(signal, 'setitimer'):
+            mode = 'thread'
+        self.interval = interval
+        self.mode = mode
+        self.stacks = Counter()
+        self.overhead = 0.0
+        self.elapsed = 0.0
+
+    def _sample(self, frame):
+        t0 = perf_counter()
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        self.stacks[tuple(stack)] += 1
+        self.overhead += perf_counter() - t0
+
+    def _handler(self, signum, frame):
+        self._sample(frame)
+
+    def _poll(self, ident):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(ident)
+            if frame is not None:
+                self._sample(frame)
+
+    def start(self):
+        self._start = perf_counter()
+        if self.mode == 'signal':
+            self._previous = signal.signal(signal.SIGPROF, self._handler)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._poll, args=(threading.main_thread().ident,), daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self.mode == 'signal':
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous)
+        else:
+            self._stop.set()
+            self._thread.join()
+        self.elapsed += perf_counter() - self._start
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def collapsed(self):
+        "Returns a list of (stack, count) pairs with the stacks in collapsed notation."
+        stacks = Counter()
+        for stack, count in self.stacks.items():
+            stacks[';'.join(label(func) for func in reversed(stack))] += count
+        return sorted(stacks.items())
+
+    def result(self):
+        return {
+            'mode': self.mode,
+            'interval': self.interval,
+            'num_samples': sum(self.stacks.values()),
+            'overhead': self.overhead / self.elapsed if self.elapsed else 0.0,
+            'stacks': self.collapsed(),
+        }
+
+
+def measure_sampled(samples, measure, interval=0.001, mode='signal'):
+    """Returns a measurement, which samples the stack during the given
+    measurement and stores the aggregated stacks of each category in samples."""
+    def measure_(key, timer, repeat=3, number=10):
+        with Sampler(interval, mode) as sampler:
+            data = measure(key, timer, repeat, number)
+        samples[key] = sampler.result()
+        return data
+    return measure_
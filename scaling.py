@@ -0,0 +1,87 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from complexity import COMPLEXITY
+
+
+# Two-sided 95% quantiles of the Student t-distribution by degrees of freedom.
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def sweep_range(N_min, N_max, num=5):
+    "Returns up to num geometrically spaced integers between N_min and N_max."
+    return sorted(set(int(round(N)) for N in np.geomspace(N_min, N_max, num)))
+
+
+def declared_exponent(cplx, N1=1e3, N2=1e6):
+    "Returns the local scaling exponent of a complexity expression such as 'N'."
+    f1, f2 = (float(eval(cplx, {'log': math.log}, {'N': N})) for N in (N1, N2))
+    return math.log(f2 / f1) / math.log(N2 / N1)
+
+
+def fit_exponent(N, t):
+    """Fit t = c * N**b and return b and its 95% confidence interval.
+
+    The confidence interval is None if there are not enough data points.
+    """
+    x, y = np.log(N), np.log(t)
+    A = np.vstack([x, np.ones(len(x))]).T
+    (b, a), res, rank, sv = np.linalg.lstsq(A, y, rcond=None)
+    dof = len(x) - 2
+    if dof < 1 or rank < 2:
+        return float(b), None
+    residuals = y - (a + b * x)
+    stderr = math.sqrt(np.sum(residuals ** 2) / dof / np.sum((x - x.mean()) ** 2))
+    t_q = T_95[dof - 1] if dof <= len(T_95) else 1.96
+    return float(b), (float(b - t_q * stderr), float(b + t_q * stderr))
+
+
+def fit_scaling(docs, tolerance=0.1):
+    """Fit the scaling exponent of each category across the given results.
+
+    Every timing repeat is used as one sample. A category is flagged when
+    the lower bound of its exponent exceeds the declared complexity by more
+    than tolerance.
+    """
+    samples = OrderedDict()
+    for doc in docs:
+        for cat, x in doc['data'].items():
+            for n, dt in x:
+                samples.setdefault(cat, []).append((doc['meta']['N'], dt / n))
+
+    result = OrderedDict()
+    for cat, values in samples.items():
+        N, t = zip(*values)
+        if len(set(N)) < 2:
+            continue
+        b, ci = fit_exponent(N, t)
+        entry = {'exponent': b, 'ci': ci, 'N': sorted(set(N))}
+        cplx = COMPLEXITY.get(cat)
+        if cplx is not None:
+            entry['declared'] = declared_exponent(cplx)
+            entry['flagged'] = (b if ci is None else ci[0]) > entry['declared'] + tolerance
+        result[cat] = entry
+    return result
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import random
+import logging
+import argparse
+import traceback
+from collections import deque
+from collections import Counter
+from multiprocessing import Process
+from multiprocessing import Queue
+from queue import Empty
+from tempfile import gettempdir
+
+import run_benchmark
+from util import get_partition
+
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def pin(cpus):
+    "Restrict the current process to the given CPUs if supported."
+    try:
+        os.sched_setaffinity(0, cpus)
+    except AttributeError:
+        logger.warning("CPU pinning is not supported on this platform.")
+
+
+def filesystem(args):
+    return get_partition(gettempdir() if args.root is None else args.root).mountpoint
+
+
+def spreads(doc):
+    "Returns the relative spread of the per-iteration times of each category."
+    result = dict()
+    for cat, x in doc.get('data', {}).items():
+        t = [dt / n for n, dt in x]
+        if len(t) > 1 and min(t) > 0:
+            result[cat] = (max(t) - min(t)) / min(t)
+    return result
+
+
+def excess_spread(doc, reference, stable=0.25):
+    """Returns the largest excess of the spread of a category over its spread
+    in the serially executed reference.
+
+    Only categories with a reference spread of at most stable are considered.
+    Without reference, the spread of every category is considered in full.
+    """
+    excess = 0
+    ref = None if reference is None else spreads(reference)
+    for cat, spread in spreads(doc).items():
+        r = 0 if ref is None else ref.get(cat)
+        if r is not None and r <= stable:
+            excess = max(excess, spread - r)
+    return excess
+
+
+def _worker(index, args, cpus, queue):
+    pin(cpus)
+    random.seed(args.seed)
+    results = []
+    try:
+        doc = run_benchmark.run(
+            args, lambda key: run_benchmark.check_skip(args, key),
+            lambda key, doc: results.append((key, doc)))
+        run_benchmark.wait_teardown()
+        # Results that were already stored are posted without key.
+        queue.put((index, results[0] if results else (None, doc), None))
+    except Exception:
+        queue.put((index, None, traceback.format_exc()))
+
+
+def receive(queue, running, poll=1.0):
+    """Returns the next result posted by a worker.
+
+    A worker that exited without posting a result, e.g., killed by the OOM
+    killer, is reported as failed.
+    """
+    while True:
+        try:
+            return queue.get(timeout=poll)
+        except Empty:
+            for index, entry in running.items():
+                process = entry[0]
+                if not process.is_alive():
+                    try:
+                        return queue.get(timeout=poll)
+                    except Empty:
+                        return index, None, "Worker exited with code {} without a result.".format(
+                            process.exitcode)
+
+
+class Scheduler(object):
+    """Execute benchmark configurations in pinned worker processes.
+
+    Every worker is pinned to its own set of CPUs and at most io_jobs
+    workers operate on the same filesystem at the same time. Results are
+    stored by the scheduler process only.
+
+    The configuration with the smallest N of each tool is executed serially
+    first and serves as reference for the timing spread of each category.
+    Concurrently executed configurations are rerun serially if the spread of
+    a category, which is stable in the reference, exceeds its reference
+    spread by more than max_spread.
+    """
+
+    def __init__(self, cpus, cores_per_job=1, io_jobs=2, max_spread=0.25):
+        self.slots = [cpus[i:i + cores_per_job]
+                      for i in range(0, len(cpus) - cores_per_job + 1, cores_per_job)]
+        if not self.slots:
+            raise ValueError("Not enough CPUs for {} cores per job.".format(cores_per_job))
+        self.cpus = cpus
+        self.io_jobs = io_jobs
+        self.max_spread = max_spread
+
+    def _run(self, configs, slots, io_jobs):
+        queue = Queue()
+        pending = deque(enumerate(configs))
+        free = list(slots)
+        io = Counter()
+        running = dict()
+        while pending or running:
+            for _ in range(len(pending)):
+                index, args = pending.popleft()
+                fs = filesystem(args)
+                if not free or io[fs] >= io_jobs:
+                    pending.append((index, args))
+                    continue
+                cpus = free.pop(0)
+                process = Process(target=_worker, args=(index, args, cpus, queue))
+                process.start()
+                io[fs] += 1
+                running[index] = [process, cpus, fs, 1]
+                for entry in running.values():
+                    entry[3] = max(entry[3], len(running))
+                logger.info("Start {} N={} on CPUs {}.".format(args.tool, args.N, cpus))
+            if not running:
+                raise RuntimeError("Unable to schedule any of the pending configurations.")
+            index, result, error = receive(queue, running)
+            process, cpus, fs, concurrent = running.pop(index)
+            process.join()
+            free.append(cpus)
+            io[fs] -= 1
+            yield index, cpus, concurrent, result, error
+
+    def _store(self, args, cpus, concurrent, result):
+        key, doc = result
+        doc['schedule'] = {'cpus': cpus, 'concurrent': concurrent}
+        run_benchmark.store_result(args, key, doc)
+        run_benchmark.finish_journal(args, key)
+
+    def _serial(self, configs):
+        "Execute configs serially and yield each configuration with its result document."
+        for index, cpus, concurrent, result, error in self._run(configs, [self.cpus], 1):
+            args = configs[index]
+            if error is not None:
+                logger.error("{} N={} failed:\n{}".format(args.tool, args.N, error))
+            elif result is not None:
+                if result[0] is not None:
+                    self._store(args, cpus, concurrent, result)
+                yield args, result[1]
+
+    def run(self, configs):
+        first = dict()
+        for args in configs:
+            if args.tool not in first or args.N < first[args.tool].N:
+                first[args.tool] = args
+        references = dict()
+        for args, doc in self._serial(list(first.values())):
+            if doc is not None and doc.get('schedule', {}).get('concurrent', 1) == 1:
+                references[args.tool] = doc
+
+        configs = [args for args in configs if args is not first[args.tool]]
+        serial = []
+        for index, cpus, concurrent, result, error in self._run(
+                configs, self.slots, self.io_jobs):
+            args = configs[index]
+            if error is not None:
+                logger.error("{} N={} failed:\n{}".format(args.tool, args.N, error))
+            elif result is not None and result[0] is not None:
+                excess = excess_spread(
+                    result[1], references.get(args.tool), stable=self.max_spread)
+                if concurrent > 1 and excess > self.max_spread:
+                    logger.warning(
+                        "{} N={} exceeds the serial timing spread by {:.0%} when run "
+                        "concurrently, rerun serially.".format(args.tool, args.N, excess))
+                    serial.append(args)
+                    continue
+                self._store(args, cpus, concurrent, result)
+
+        for _ in self._serial(serial):
+            pass
+
+
+def main(args, extra):
+    parser = run_benchmark.make_parser()
+    # The journal entries are only removed once the scheduler stored the result.
+    configs = [parser.parse_args([tool, '-N', str(N), '--defer-journal'] + extra)
+               for tool in args.tools for N in args.N]
+    scheduler = Scheduler(
+        available_cpus(), cores_per_job=args.cores_per_job,
+        io_jobs=args.io_jobs, max_spread=args.max_spread)
+    scheduler.run(configs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run independent benchmark configurations in parallel. "
+                    "All unknown arguments are forwarded to run_benchmark.py.")
+    parser.add_argument(
+        '--tools', nargs='+', default=['signac', 'datreant'],
+        help="The data management tools to benchmark.")
+    parser.add_argument(
+        '-N', type=int, nargs='+', default=[100, 1000, 10000],
+        help="The data space sizes to benchmark.")
+    parser.add_argument(
+        '--cores-per-job', type=int, default=1,
+        help="The number of CPUs each worker process is pinned to.")
+    parser.add_argument(
+        '--io-jobs', type=int, default=2,
+        help="The maximum number of concurrent configurations per filesystem.")
+    parser.add_argument(
+        '--max-spread', type=float, default=0.25,
+        help="Rerun configurations serially if the relative spread of their "
+             "repeated timings exceeds the spread of a serial reference by more "
+             "than this value when run concurrently.")
+    parser.add_argument(
+        '--debug', action='store_true',
+        help="Activate debug logging output.")
+    args, extra = parser.parse_known_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    main(args, extra)
@@ -0,0 +1,175 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import json
+import string
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+ALPHABET = np.frombuffer(string.ascii_lowercase.encode(), dtype=np.uint8)
+
+TYPES = ('index', 'int', 'float', 'bool', 'str', 'list', 'dict')
+
+# Each field is specified by its 'type' and optionally by:
+#   presence: The probability that the key is present (default: 1).
+#   cardinality: The number of distinct values, unique values if omitted.
+#   zipf: The exponent of the Zipf distribution over the distinct values (default: 0).
+#   min, max: The range of 'int' and 'float' values.
+#   size: The length of 'str' values.
+#   p: The probability of 'bool' values to be true.
+#   length, items: The length and the item field of 'list' values.
+#   keys: The mapping of keys to fields of 'dict' values.
+# The 'index' type is the job's index and ensures unique state points.
+SCHEMAS = {
+    'sweep': {
+        'statepoint': OrderedDict([
+            ('T', {'type': 'float', 'min': 0.1, 'max': 5.0, 'cardinality': 20}),
+            ('p', {'type': 'float', 'min': 0.0, 'max': 1.0, 'cardinality': 10}),
+            ('N', {'type': 'int', 'min': 100, 'max': 100000, 'cardinality': 5}),
+            ('model', {'type': 'str', 'size': 8, 'cardinality': 4, 'zipf': 1.5}),
+            ('replica', {'type': 'index'}),
+        ]),
+        'document': OrderedDict([
+            ('converged', {'type': 'bool', 'p': 0.8}),
+            ('energy', {'type': 'float', 'min': -100.0, 'max': 0.0}),
+            ('steps', {'type': 'int', 'min': 0, 'max': 1000000, 'presence': 0.8}),
+        ]),
+    },
+    'nested': {
+        'statepoint': OrderedDict([
+            ('system', {'type': 'dict', 'keys': OrderedDict([
+                ('N', {'type': 'int', 'min': 64, 'max': 4096, 'cardinality': 4}),
+                ('phi', {'type': 'float', 'min': 0.1, 'max': 0.7, 'cardinality': 12}),
+                ('box', {'type': 'list', 'length': 3,
+                         'items': {'type': 'float', 'min': 5, 'max': 50, 'cardinality': 3}}),
+            ])}),
+            ('integrator', {'type': 'dict', 'keys': OrderedDict([
+                ('name', {'type': 'str', 'size': 6, 'cardinality': 3, 'zipf': 2.0}),
+                ('dt', {'type': 'float', 'min': 0.001, 'max': 0.01, 'cardinality': 3}),
+                ('kT', {'type': 'float', 'min': 0.5, 'max': 2.0, 'cardinality': 16}),
+            ])}),
+            ('restart', {'type': 'bool', 'p': 1.0, 'presence': 0.1}),
+            ('seed', {'type': 'index'}),
+        ]),
+    },
+    'sparse': {
+        'statepoint': OrderedDict(
+            [('seed', {'type': 'index'})] +
+            [('opt_{}'.format(j), {'type': 'str', 'size': 12, 'cardinality': 50,
+                                   'zipf': 1.2, 'presence': 0.5 ** (1 + j % 5)})
+             for j in range(20)]),
+    },
+}
+
+
+def load_schema(name):
+    "Returns the built-in schema with the given name or the schema stored in a JSON file."
+    if name in SCHEMAS:
+        return SCHEMAS[name]
+    elif os.path.isfile(name):
+        with open(name) as file:
+            return json.load(file, object_pairs_hook=OrderedDict)
+    else:
+        raise ValueError("Unknown schema '{}', choose from {} or provide a JSON file.".format(
+            name, ', '.join(sorted(SCHEMAS))))
+
+
+class Field(object):
+
+    def __init__(self, spec, path, seed):
+        self.type = spec['type']
+        if self.type not in TYPES:
+            raise ValueError("Unknown type '{}' of field '{}'.".format(self.type, path))
+        self.presence = spec.get('presence', 1.0)
+        self.spec = spec
+        if self.type == 'list':
+            self.items = Field(spec['items'], path + '[]', seed)
+        elif self.type == 'dict':
+            self.keys = [(key, Field(value, path + '.' + key, seed))
+                         for key, value in spec['keys'].items()]
+        self.pool = None
+        cardinality = spec.get('cardinality')
+        if cardinality and self.type in ('int', 'float', 'str'):
+            rng = np.random.default_rng([seed, zlib.crc32(path.encode())])
+            self.pool = list(OrderedDict.fromkeys(self._draw(rng) for _ in range(cardinality)))
+            weights = 1.0 / np.arange(1, len(self.pool) + 1) ** spec.get('zipf', 0)
+            self.cdf = np.cumsum(weights) / weights.sum()
+
+    def _draw(self, rng):
+        spec = self.spec
+        if self.type == 'int':
+            return int(rng.integers(spec.get('min', 0), spec.get('max', 2 ** 31)))
+        elif self.type == 'float':
+            return round(float(rng.uniform(spec.get('min', 0.0), spec.get('max', 1.0))), 6)
+        elif self.type == 'str':
+            size = spec.get('size', 8)
+            return ALPHABET[rng.integers(0, len(ALPHABET), size=size)].tobytes().decode()
+
+    def value(self, rng, i):
+        if self.type == 'index':
+            return i
+        elif self.type == 'bool':
+            return bool(rng.random() < self.spec.get('p', 0.5))
+        elif self.type == 'list':
+            return [self.items.value(rng, i) for _ in range(self.spec.get('length', 1))]
+        elif self.type == 'dict':
+            return make_mapping(self.keys, rng, i)
+        elif self.pool is not None:
+            return self.pool[min(len(self.pool) - 1, int(np.searchsorted(self.cdf, rng.random())))]
+        else:
+            return self._draw(rng)
+
+
+def make_mapping(fields, rng, i):
+    mapping = OrderedDict()
+    for key, field in fields:
+        if field.presence >= 1 or rng.random() < field.presence:
+            mapping[key] = field.value(rng, i)
+    return mapping
+
+
+class Schema(object):
+    """Generate state points and documents from a declarative schema.
+
+    The distinct values of all fields with limited cardinality are drawn
+    once for the given seed, the values of each job are drawn from the
+    job's random number generator.
+    """
+
+    def __init__(self, spec, seed=0):
+        self.spec = spec
+        self.statepoint = [(key, Field(value, key, seed))
+                           for key, value in spec['statepoint'].items()]
+        if not any(field.type == 'index' for key, field in self.statepoint):
+            raise ValueError("The state point schema requires a top-level field of "
+                             "type 'index' to ensure unique state points.")
+        self.document = None
+        if spec.get('document'):
+            self.document = [(key, Field(value, 'doc.' + key, seed))
+                             for key, value in spec['document'].items()]
+
+    def make_job_data(self, rng, i):
+        "Returns the state point and document (or None) of the i-th job."
+        sp = make_mapping(self.statepoint, rng, i)
+        doc = None if self.document is None else make_mapping(self.document, rng, i)
+        return sp, doc
@@ -0,0 +1,119 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import math
+from time import time
+
+import numpy as np
+
+
+def calibrate(timer, target_time=0.2):
+    "Returns the number of loops for one repeat of timer to take at least target_time."
+    number = 1
+    while True:
+        n, dt = timer.timeit(number)
+        if dt >= target_time:
+            return number
+        number = int(min(10 * number, max(2 * number, number * 1.2 * target_time / max(dt, 1e-9))))
+
+
+def reject_outliers(samples, k=3.0):
+    """Returns the samples within k scaled median absolute deviations of the
+    median and the number of rejected samples."""
+    x = np.asarray(samples)
+    median = np.median(x)
+    mad = 1.4826 * np.median(np.abs(x - median))
+    if mad == 0:
+        return x, 0
+    inliers = x[np.abs(x - median) <= k * mad]
+    return inliers, len(x) - len(inliers)
+
+
+def median_ci(samples, z=1.96):
+    "Returns a distribution-free confidence interval of the median (95% by default)."
+    x = np.sort(samples)
+    n = len(x)
+    lo = int(math.floor((n - z * math.sqrt(n)) / 2))
+    hi = int(math.ceil(1 + (n + z * math.sqrt(n)) / 2)) - 1
+    return float(x[max(0, lo)]), float(x[min(n - 1, hi)])
+
+
+def summarize(samples, number):
+    "Returns the summary statistics of a set of per-iteration time samples."
+    inliers, outliers = reject_outliers(samples)
+    ci = median_ci(inliers)
+    median = float(np.median(inliers))
+    return {
+        'samples': list(samples),
+        'number': number,
+        'repeat': len(samples),
+        'outliers': outliers,
+        'median': median,
+        'min': float(np.min(samples)),
+        'ci': ci,
+        'ci_width': (ci[1] - ci[0]) / median if median > 0 else 0.0,
+    }
+
+
+def adaptive_repeat(timer, number=None, target_time=0.2, ci_width=0.05, budget=30,
+                    min_repeat=5, max_repeat=1000):
+    """Repeat timer until the confidence interval of the median is narrow enough.
+
+    The number of loops per repeat is calibrated to target_time, unless it is
+    provided explicitly. Repetition stops once the relative width of the
+    confidence interval of the median is below ci_width, after max_repeat
+    repeats, or when the time budget (in seconds) is exhausted. Returns the
+    (number, time) tuples of all repeats and their summary statistics.
+    """
+    start = time()
+    if number is None:
+        number = calibrate(timer, target_time)
+    data = []
+    while True:
+        data.append(timer.timeit(number))
+        if len(data) >= min_repeat:
+            summary = summarize([dt / n for n, dt in data], number)
+            if summary['ci_width'] <= ci_width:
+                summary['converged'] = True
+                break
+        if len(data) >= max_repeat or time() - start > budget:
+            summary = summarize([dt / n for n, dt in data], number)
+            summary['converged'] = summary['ci_width'] <= ci_width
+            break
+    return data, summary
+
+
+def mann_whitney_u(x, y):
+    """Returns the Mann-Whitney U statistic of x and the two-sided p-value
+    of the normal approximation."""
+    n1, n2 = len(x), len(y)
+    values = np.concatenate([x, y])
+    order = values.argsort()
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(1, len(values) + 1)
+    for v in np.unique(values):
+        tied = values == v
+        ranks[tied] = ranks[tied].mean()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    mu = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if sigma == 0:
+        return float(u), 1.0
+    z = (u - mu) / sigma
+    return float(u), math.erfc(abs(z) / math.sqrt(2))
@@ -0,0 +1,230 @@
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import six
+import time
+import uuid
+import logging
+import threading
+from tempfile import mkdtemp
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+if six.PY2:
+    from tempdir import TemporaryDirectory
+else:
+    from tempfile import TemporaryDirectory
+
+
+logger = logging.getLogger(__name__)
+
+
+def _scan(path, files, dirs):
+    "Appends all files below path with their size to files and all directories to dirs."
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+                _scan(entry.path, files, dirs)
+            else:
+                files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+
+
+class _Tree(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.future = Future()
+        self.files = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.scanned = False
+        self.error = None
+        self.lock = threading.Lock()
+        self.start = None
+
+
+class Reaper(object):
+    """Deletes directory trees in the background.
+
+    Each tree is renamed aside immediately and its files and directories
+    are unlinked in chunks by a pool of threads. The caller only scans
+    the tree and blocks while more than max_pending bytes are waiting to
+    be unlinked. The deletion of each tree is timed from when its first
+    chunk is unlinked, excluding the time spent waiting in the queue, and
+    the result is available through the future of its original path.
+    """
+
+    def __init__(self, max_workers=4, max_pending=None, chunksize=1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.chunksize = chunksize
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._futures = dict()
+        self._callbacks = []
+
+    def __repr__(self):
+        return "{}(max_workers={!r}, max_pending={!r})".format(
+            type(self).__name__, self.max_workers, self.max_pending)
+
+    def _submit(self, tree, files, dirs):
+        size = sum(s for fn, s in files)
+        with self._cond:
+            while self.max_pending is not None and self._pending and \
+                    self._pending + size > self.max_pending:
+                self._cond.wait()
+            self._pending += size
+        with tree.lock:
+            tree.chunks += 1
+        self._executor.submit(self._unlink, tree, files, dirs, size)
+
+    def _unlink(self, tree, files, dirs, size):
+        with tree.lock:
+            if tree.start is None:
+                tree.start = time.time()
+        try:
+            for fn, s in files:
+                os.unlink(fn)
+            for path in reversed(dirs):
+                os.rmdir(path)
+        except Exception as error:
+            tree.error = error
+        finally:
+            with self._cond:
+                self._pending -= size
+                self._cond.notify_all()
+            with tree.lock:
+                tree.chunks -= 1
+                tree.files += len(files)
+                tree.bytes += size
+                done = tree.scanned and not tree.chunks
+            if done:
+                self._finish(tree)
+
+    def _finish(self, tree):
+        try:
+            if tree.error is None:
+                os.rmdir(tree.path)
+        except OSError as error:
+            tree.error = error
+        if tree.error is not None:
+            tree.future.set_exception(tree.error)
+            return
+        dt = 0 if tree.start is None else time.time() - tree.start
+        tree.future.set_result({
+            'files': tree.files,
+            'bytes': tree.bytes,
+            'time': dt,
+            'files_per_second': tree.files / dt if dt > 0 else None,
+            'bytes_per_second': tree.bytes / dt if dt > 0 else None,
+            'workers': self.max_workers,
+        })
+
+    def discard(self, path):
+        "Rename path aside and delete it in the background. Returns the future of the deletion."
+        path = os.path.realpath(path)
+        tree = _Tree('{}.trash-{}'.format(path, uuid.uuid4().hex))
+        os.rename(path, tree.path)
+        self._futures[path] = tree.future
+        try:
+            files, dirs = [], []
+            with os.scandir(tree.path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                        _scan(entry.path, files, dirs)
+                    else:
+                        files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+                    if len(files) >= self.chunksize:
+                        self._submit(tree, files, dirs)
+                        files, dirs = [], []
+            self._submit(tree, files, dirs)
+        except Exception as error:
+            tree.error = error
+            raise
+        finally:
+            with tree.lock:
+                tree.scanned = True
+                done = not tree.chunks
+            if done:
+                self._finish(tree)
+        return tree.future
+
+    def future(self, path):
+        "Returns the future of the deletion of path."
+        return self._futures[os.path.realpath(path)]
+
+    def then(self, path, func):
+        """Call func with the future of the deletion of path once it has completed.
+
+        Unlike callbacks added to the future directly, wait() also waits for func.
+        """
+        done = threading.Event()
+        self._callbacks.append(done)
+
+        def callback(future):
+            try:
+                func(future)
+            finally:
+                done.set()
+        self.future(path).add_done_callback(callback)
+
+    def wait(self):
+        "Wait until all discarded trees are deleted and their callbacks have returned."
+        wait(list(self._futures.values()))
+        for done in self._callbacks:
+            done.wait()
+
+    def shutdown(self):
+        self.wait()
+        self._executor.shutdown()
+
+
+class ReapedDirectory(object):
+    "A temporary directory that is discarded by a reaper on cleanup."
+
+    def __init__(self, reaper, dir=None):
+        self.reaper = reaper
+        self.name = mkdtemp(dir=dir)
+        self._closed = False
+
+    def __repr__(self):
+        return "<{} {!r}>".format(type(self).__name__, self.name)
+
+    def __enter__(self):
+        return self.name
+
+    def cleanup(self):
+        if not self._closed:
+            self._closed = True
+            self.reaper.discard(self.name)
+
+    def __exit__(self, exc, value, tb):
+        self.cleanup()
+
+
+def temporary_directory(dir=None, reaper=None):
+    "Returns a temporary directory, which is deleted by reaper if provided."
+    if reaper is None:
+        return TemporaryDirectory(dir=dir)
+    return ReapedDirectory(reaper, dir=dir)
@@ -22,17 +22,19 @@ import argparse
 import signac
 from signac.contrib.collection import _traverse_tree
 
+from results import open_results
+
 parser = argparse.ArgumentParser()
 parser.add_argument(
-    'filename', nargs='?', default='benchmark.txt',
-    help="The name of the benchmark collection file.")
+    'filename', nargs='?', default='benchmark.db',
+    help="The name of the benchmark result store.")
 args = parser.parse_args()
 
 
 db = signac.get_database('testing')
 
-with signac.Collection.open(args.filename) as c:
-    for doc in c:
+with open_results(args.filename) as results:
+    for doc in results.find(profile=True):
         del doc['_id']
         key = dict(_traverse_tree(doc['meta'], key='meta'))
         key['profile'] = {'$ne' if doc.get('profile') else '$eq': None}
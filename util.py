@@ -18,6 +18,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import os
+import re
+import hashlib
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import psutil
 
 
@@ -28,6 +34,15 @@ def fmt_size(size, units=None):
     return str(size) + units.pop(0) if size < 1024 else fmt_size(size >> 10, units[1:])
 
 
+def parse_size(size):
+    "Returns the number of bytes of a human readable size string, e.g., '10GB'."
+    m = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGTPE]?)B?\s*$', str(size).upper())
+    if m is None:
+        raise ValueError("Invalid size '{}'.".format(size))
+    exponent = ' KMGTPE'.index(m.group(2) or ' ')
+    return int(float(m.group(1)) * 1024 ** exponent)
+
+
 def get_partition(path):
     path = os.path.realpath(path)
     candidates = dict()
@@ -39,3 +54,58 @@ def get_partition(path):
         return candidates[list(sorted(candidates, key=len))[-1]]
     else:
         raise LookupError(path)
+
+
+def _scan_dir(path, groups, default):
+    "Returns the total size of all files below path grouped by file name."
+    sizes = dict()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                for group, size in _scan_dir(entry.path, groups, default).items():
+                    sizes[group] = sizes.get(group, 0) + size
+            else:
+                group = groups.get(entry.name, default)
+                if group is not None:
+                    sizes[group] = sizes.get(group, 0) + entry.stat(follow_symlinks=False).st_size
+    return sizes
+
+
+def _scan_chunk(paths, groups, default):
+    return [_scan_dir(path, groups, default) for path in paths]
+
+
+def scan_workspace(workspace, groups, default=None, max_workers=None, chunksize=1000):
+    """Returns the size of all files in each directory of the workspace.
+
+    The files are grouped by mapping their name with groups, files of other
+    names are accounted as default group or ignored if default is None. The
+    directories are scanned in parallel by a thread pool. Returns one dict
+    of group sizes per directory.
+    """
+    with os.scandir(workspace) as entries:
+        paths = [entry.path for entry in entries if entry.is_dir()]
+    chunks = [paths[i:i + chunksize] for i in range(0, len(paths), chunksize)]
+    with ThreadPoolExecutor(max_workers) as executor:
+        results = executor.map(partial(_scan_chunk, groups=groups, default=default), chunks)
+        return [sizes for chunk in results for sizes in chunk]
+
+
+def size_histogram(sizes):
+    "Returns a histogram of sizes with bins at powers of two."
+    sizes = np.asarray(sizes)
+    if not len(sizes):
+        return {'bins': [], 'counts': []}
+    lo = int(np.floor(np.log2(max(1, sizes.min()))))
+    hi = int(np.ceil(np.log2(max(2, sizes.max() + 1))))
+    bins = 2 ** np.arange(lo, hi + 1)
+    if sizes.min() < 1:
+        bins = np.concatenate([[0], bins])
+    counts, bins = np.histogram(sizes, bins=bins)
+    return {'bins': bins.tolist(), 'counts': counts.tolist()}
+
+
+def dataspace_hash(workspace):
+    "Returns a hash of the job directory names within workspace, which identify the state points."
+    names = sorted(entry.name for entry in os.scandir(workspace) if entry.is_dir())
+    return hashlib.sha1('\n'.join(names).encode()).hexdigest()
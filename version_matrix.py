@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# Copyright 2017 The Regents of the University of Michigan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import sys
+import glob
+import logging
+import argparse
+import subprocess
+from collections import OrderedDict
+from tempfile import gettempdir
+from tempfile import TemporaryDirectory
+
+import pandas as pd
+
+from report_benchmark import tr
+from report_benchmark import normalize
+from results import open_results
+from results import stream_results
+
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _call(cmd, **kwargs):
+    logger.debug("Execute: {}".format(' '.join(cmd)))
+    return subprocess.check_output(cmd, **kwargs)
+
+
+def find_sources(wheelhouse):
+    "Returns all signac wheels, source distributions and source checkouts in wheelhouse."
+    sources = []
+    for path in sorted(glob.glob(os.path.join(wheelhouse, '*'))):
+        if path.endswith(('.whl', '.tar.gz', '.zip')) or \
+                os.path.isfile(os.path.join(path, 'setup.py')) or \
+                os.path.isfile(os.path.join(path, 'pyproject.toml')):
+            sources.append(path)
+    return sources
+
+
+def make_env(workdir, name, source):
+    """Create a virtual environment with signac installed from source.
+
+    The environment inherits all other dependencies from the system site
+    packages and is reused if it already exists. Returns the path to the
+    environment's python interpreter.
+    """
+    path = os.path.join(workdir, name)
+    python = os.path.join(path, 'bin', 'python')
+    if not os.path.isfile(os.path.join(path, '.installed')):
+        logger.info("Create environment '{}' from '{}'.".format(name, source))
+        _call([sys.executable, '-m', 'venv', '--clear', '--system-site-packages', path])
+        _call([python, '-m', 'pip', 'install', '--quiet', '--no-index', '--no-deps',
+               '--ignore-installed', '--no-build-isolation', source])
+        open(os.path.join(path, '.installed'), 'w').close()
+    return python
+
+
+def export_commit(repo, commit, workdir):
+    "Export the tree of commit into a directory within workdir and return its path."
+    path = os.path.join(workdir, 'src', commit)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+        archive = subprocess.Popen(['git', '-C', repo, 'archive', commit], stdout=subprocess.PIPE)
+        _call(['tar', '-x', '-C', path], stdin=archive.stdout)
+        if archive.wait():
+            raise RuntimeError("Unable to export commit '{}'.".format(commit))
+    return path
+
+
+def run_version(python, workdir, extra):
+    """Execute run_benchmark.py with python and return the result document.
+
+    The result is stored in a temporary result file, such that any other
+    output of the benchmark does not interfere with the result.
+    """
+    with TemporaryDirectory(dir=workdir) as tmpdir:
+        filename = os.path.join(tmpdir, 'result.txt')
+        cmd = [python, os.path.join(ROOT, 'run_benchmark.py'), 'signac',
+               '--output', filename] + extra
+        _call(cmd, cwd=ROOT)
+        docs = list(stream_results(filename))
+    if len(docs) != 1:
+        raise RuntimeError("Expected one result, but found {}.".format(len(docs)))
+    doc = docs[0]
+    doc.pop('_id', None)
+    return doc
+
+
+def times(doc):
+    "Returns the time per operation of each category in ms."
+    return OrderedDict(normalize(doc['data'], doc['meta']['N']))
+
+
+def store(args, doc):
+    if args.output:
+        with open_results(args.output) as results:
+            results.replace_one({'meta': doc['meta']}, doc)
+
+
+def measure_version(args, name, source, extra):
+    """Returns the result document of the signac version installed from source
+    or None if it could not be installed or benchmarked."""
+    try:
+        doc = run_version(make_env(args.workdir, name, source), args.workdir, extra)
+    except (subprocess.CalledProcessError, RuntimeError) as error:
+        logger.warning("Unable to benchmark '{}': {}".format(name, error))
+        return None
+    store(args, doc)
+    return doc
+
+
+def main_matrix(args, extra):
+    sources = args.sources or find_sources(args.wheelhouse)
+    if not sources:
+        raise ValueError("No signac sources found.")
+    columns = OrderedDict()
+    untested = []
+    for source in sources:
+        name = os.path.basename(source.rstrip(os.sep))
+        doc = measure_version(args, name, source, extra)
+        if doc is None:
+            untested.append(name)
+            continue
+        columns[doc['meta']['versions']['signac'] + ' ({})'.format(name)] = times(doc)
+    if untested:
+        print("Versions that could not be tested: {}.".format(', '.join(untested)))
+    if not columns:
+        raise RuntimeError("None of the versions could be tested.")
+    df = pd.DataFrame(columns)
+    print("All values in ms.")
+    print(df.rename(index=tr).round(3))
+
+
+def main_bisect(args, extra):
+    revisions = _call(['git', '-C', args.repo, 'rev-list', '--reverse',
+                       '{}..{}'.format(args.good, args.bad)]).decode().split()
+    good = _call(['git', '-C', args.repo, 'rev-parse', args.good]).decode().strip()
+    commits = [good] + revisions
+    results = dict()
+
+    def measure(index):
+        "Returns the times of the commit at index or None if it could not be tested."
+        if index not in results:
+            commit = commits[index]
+            try:
+                source = export_commit(args.repo, commit, args.workdir)
+            except (subprocess.CalledProcessError, RuntimeError) as error:
+                logger.warning("Unable to export '{}': {}".format(commit, error))
+                doc = None
+            else:
+                doc = measure_version(args, commit, source, extra)
+            results[index] = None if doc is None else times(doc)
+        return results[index]
+
+    good = measure(0)
+    bad = measure(len(commits) - 1)
+    if good is None or bad is None:
+        raise RuntimeError("Unable to benchmark the {} revision.".format(
+            'good' if good is None else 'bad'))
+    for cat in good:
+        if bad.get(cat, 0) <= args.threshold * good[cat]:
+            print("{}: no regression ({:.3f} ms -> {:.3f} ms).".format(
+                tr(cat), good[cat], bad.get(cat, float('nan'))))
+            continue
+        # Commits that can not be tested or do not measure the category are skipped.
+        lo, hi = 0, len(commits) - 1
+        skipped = set()
+        while True:
+            candidates = [i for i in range(lo + 1, hi) if i not in skipped]
+            if not candidates:
+                break
+            mid = candidates[len(candidates) // 2]
+            times_mid = measure(mid)
+            t = None if times_mid is None else times_mid.get(cat)
+            if t is None:
+                if times_mid is not None:
+                    logger.warning("Skip commit {} without measurement of {}.".format(
+                        commits[mid], tr(cat)))
+                skipped.add(mid)
+            elif t > args.threshold * good[cat]:
+                hi = mid
+            else:
+                lo = mid
+        print("{}: first regressing commit {} ({:.3f} ms -> {:.3f} ms).".format(
+            tr(cat), commits[hi], results[lo][cat], results[hi][cat]))
+        if hi - lo > 1:
+            print("The regression could also be caused by one of the skipped commits {}.".format(
+                ', '.join(commits[lo + 1:hi])))
+    untested = [commits[i] for i, r in sorted(results.items()) if r is None]
+    if untested:
+        print("Commits that could not be tested: {}.".format(', '.join(untested)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark multiple signac versions in isolated environments. "
+                    "All unknown arguments are forwarded to run_benchmark.py.")
+    parser.add_argument(
+        '--workdir', default=os.path.join(gettempdir(), 'signac-version-matrix'),
+        help="The directory to create the virtual environments in.")
+    parser.add_argument(
+        '-o', '--output',
+        help="Additionally store all results in the given result store.")
+    parser.add_argument(
+        '--debug', action='store_true',
+        help="Activate debug logging output.")
+    subparsers = parser.add_subparsers()
+
+    parser_matrix = subparsers.add_parser(
+        'matrix', help="Benchmark all versions in a local wheelhouse.")
+    parser_matrix.add_argument(
+        'wheelhouse', nargs='?', default='wheelhouse',
+        help="A directory of signac wheels, source distributions or source checkouts.")
+    parser_matrix.add_argument(
+        '--sources', nargs='+',
+        help="Benchmark the given wheels or source directories instead.")
+    parser_matrix.set_defaults(func=main_matrix)
+
+    parser_bisect = subparsers.add_parser(
+        'bisect', help="Find the first regressing commit per category.")
+    parser_bisect.add_argument(
+        'repo',
+        help="The path to a signac git repository.")
+    parser_bisect.add_argument(
+        'good',
+        help="The last known good revision.")
+    parser_bisect.add_argument(
+        'bad',
+        help="The first known bad revision.")
+    parser_bisect.add_argument(
+        '--threshold', type=float, default=1.1,
+        help="Times exceeding the good revision by more than this factor are regressions.")
+    parser_bisect.set_defaults(func=main_bisect)
+
+    args, extra = parser.parse_known_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    if not hasattr(args, 'func'):
+        parser.print_usage()
+        sys.exit(2)
+    os.makedirs(args.workdir, exist_ok=True)
+    args.func(args, extra)